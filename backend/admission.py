@@ -0,0 +1,75 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from deadline import LatencyEstimate
+
+# Clients are never told to wait longer than this before retrying
+MAX_RETRY_AFTER = 60
+
+
+class Overloaded(Exception):
+    """A request was refused because the server is at capacity."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server is overloaded ({reason}); retry after {retry_after}s")
+        self.reason = reason  # 'queue_full' or 'queue_timeout'
+        self.retry_after = retry_after  # Seconds until a slot is likely to be free
+
+
+class AdmissionController:
+    """Run at most max_active requests at once and queue at most max_queued more.
+
+    Requests that find the queue full, or that wait in it longer than
+    queue_timeout seconds, are refused with Overloaded straight away, so a
+    burst costs a quick retry instead of memory and ever longer latencies.
+    Waiting requests are admitted in arrival order.
+    """
+
+    def __init__(self, max_active: int, max_queued: int, queue_timeout: float):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_active)
+        self._durations = LatencyEstimate()  # How long admitted requests hold their slot
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to be free: the queue ahead, worked off max_active at a time."""
+        per_request = self._durations.value or 1.0
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(per_request * (self.queued + 1) / self.max_active)))
+
+    async def _acquire(self) -> None:
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return
+
+        if self.queued >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded('queue_full', self.retry_after())
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded('queue_timeout', self.retry_after()) from None
+        finally:
+            self.queued -= 1
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block, waiting in the queue if needed."""
+        await self._acquire()
+        self.active += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+            self._durations.observe(time.monotonic() - started)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""End-to-end load test of the scraping API against a local synthetic website.
+
+Starts benchmarks/synthetic_site.py and the FastAPI app from main.py (under
+uvicorn) as subprocesses. Then concurrent clients call /scrape with seed pages
+from the synthetic site. The report covers latency percentiles, requests/sec
+and the API server's memory; --json writes it in machine-readable form.
+Nothing leaves the machine:
+
+    python benchmarks/loadtest.py --clients 32 --requests 500 --latency-ms 80 --error-rate 0.05
+    python benchmarks/loadtest.py --duration 60 --no-cache --json load.json
+
+Use --server-url to drive an API server that is already running instead.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from synthetic_site import add_site_arguments, site_config
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+ENDPOINTS = {
+    'scrape': '/scrape',
+    'stream': '/scrape/stream',
+}
+
+
+def _wait_for_port(host: str, port: int, timeout: float, process: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process exited with status {process.returncode} before listening on port {port}")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on {host}:{port} after {timeout}s")
+
+
+def start_site(args: argparse.Namespace, log) -> subprocess.Popen:
+    command = [sys.executable, os.path.join(BENCHMARKS_DIR, 'synthetic_site.py')]
+    for port in args.site_ports:
+        command += ['--port', str(port)]
+    config = site_config(args)
+    command += [
+        '--pages', str(config.pages), '--links', str(config.links), '--page-bytes', str(config.page_bytes),
+        '--latency-ms', str(config.latency_ms), '--latency-jitter-ms', str(config.latency_jitter_ms),
+        '--error-rate', str(config.error_rate), '--non-html-rate', str(config.non_html_rate),
+        '--throttle-rate', str(config.throttle_rate), '--crawl-delay', str(config.crawl_delay),
+        '--duplicate-rate', str(config.duplicate_rate),
+        '--edition', str(config.edition), '--change-rate', str(config.change_rate),
+        '--site-seed', str(config.seed),
+    ]
+    if not config.etags:
+        command.append('--no-etags')
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    for port in args.site_ports:
+        _wait_for_port('127.0.0.1', port, 15, process)
+    return process
+
+
+def start_server(args: argparse.Namespace, workdir: str, log) -> subprocess.Popen:
+    env = dict(os.environ)
+    if args.no_cache:
+        env['SCRAPER_CACHE_TTL'] = '0'
+    if not args.polite:
+        # Every page comes from a handful of local hosts; per-host rate limits would be all we measured
+        env['SCRAPER_POLITENESS_INITIAL_RATE'] = env['SCRAPER_POLITENESS_MAX_RATE'] = '100000'
+        env['SCRAPER_POLITENESS_BURST'] = '100000'
+    for assignment in args.server_env:
+        name, _, value = assignment.partition('=')
+        env[name] = value
+
+    # Run from a scratch directory so app.log does not land in the source tree
+    if args.server_workers > 1:
+        command = [
+            sys.executable, os.path.join(BACKEND_DIR, 'serve.py'),
+            '--host', '127.0.0.1', '--port', str(args.server_port), '--workers', str(args.server_workers),
+        ]
+    else:
+        command = [
+            sys.executable, '-m', 'uvicorn', 'main:app', '--app-dir', BACKEND_DIR,
+            '--host', '127.0.0.1', '--port', str(args.server_port), '--log-level', 'warning',
+        ]
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    _wait_for_port('127.0.0.1', args.server_port, 30, process)
+    return process
+
+
+def _read_memory(pid: int) -> Dict[str, int]:
+    """Resident and peak resident bytes of a process, from /proc (Linux only)."""
+    memory = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    name, value = line.split(':', 1)
+                    memory[name] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return memory
+
+
+class MemorySampler:
+    """Polls the server's resident memory while the load runs."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[int] = []
+        self.peak: Optional[int] = None
+
+    async def run(self) -> None:
+        if self.pid is None:
+            return
+        while True:
+            rss = _read_memory(self.pid).get('VmRSS')
+            if rss is not None:
+                self.samples.append(rss)
+            await asyncio.sleep(self.interval)
+
+    def report(self) -> Dict[str, Optional[int]]:
+        if self.pid is not None:
+            # VmHWM is the kernel's high-water mark, which also catches spikes between samples
+            self.peak = _read_memory(self.pid).get('VmHWM')
+        return {
+            'rss_start_bytes': self.samples[0] if self.samples else None,
+            'rss_end_bytes': self.samples[-1] if self.samples else None,
+            'rss_max_sampled_bytes': max(self.samples) if self.samples else None,
+            'rss_peak_bytes': self.peak,
+        }
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class LoadGenerator:
+    """Concurrent clients that scrape random seed pages until the request or time budget runs out."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.url = args.server_url.rstrip('/') + ENDPOINTS[args.endpoint]
+        self.hosts = [f"127.0.0.1:{port}" for port in args.site_ports]
+        self.random = random.Random(args.seed)
+        self.issued = 0
+        self.deadline: Optional[float] = None
+        self.latencies: List[float] = []  # Seconds, for completed HTTP 200 responses
+        self.statuses: Dict[str, int] = {}
+
+    def _next_seed(self) -> Optional[str]:
+        if self.deadline is not None:
+            if time.monotonic() >= self.deadline:
+                return None
+        elif self.issued >= self.args.requests:
+            return None
+
+        self.issued += 1
+        host = self.random.choice(self.hosts)
+        return f"http://{host}/p/{self.random.randrange(self.args.pages)}"
+
+    async def _request(self, session: aiohttp.ClientSession, seed: str) -> None:
+        start = time.perf_counter()
+        try:
+            async with session.get(self.url, params={'url': seed}) as response:
+                # Read the whole body; for the stream endpoint that is the last event
+                await response.read()
+                status = str(response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == '200':
+            self.latencies.append(elapsed)
+
+    async def _client(self, session: aiohttp.ClientSession) -> None:
+        while True:
+            seed = self._next_seed()
+            if seed is None:
+                return
+            await self._request(session, seed)
+
+    async def run(self) -> float:
+        """Run every client to completion and return the wall time in seconds."""
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        connector = aiohttp.TCPConnector(limit=self.args.clients)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            start = time.perf_counter()
+            if self.args.duration:
+                self.deadline = time.monotonic() + self.args.duration
+            await asyncio.gather(*(self._client(session) for _ in range(self.args.clients)))
+            return time.perf_counter() - start
+
+    def report(self, wall_time: float) -> Dict:
+        latencies = sorted(self.latencies)
+        completed = sum(self.statuses.values())
+        return {
+            'requests': completed,
+            'ok': len(latencies),
+            'statuses': dict(sorted(self.statuses.items())),
+            'wall_seconds': wall_time,
+            'requests_per_sec': completed / wall_time if wall_time else None,
+            'ok_per_sec': len(latencies) / wall_time if wall_time else None,
+            'latency_seconds': {
+                'min': latencies[0] if latencies else None,
+                'mean': statistics.fmean(latencies) if latencies else None,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else None,
+            },
+        }
+
+
+async def _site_stats(port: int) -> Optional[Dict]:
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/_stats") as response:
+                return await response.json()
+    except aiohttp.ClientError:
+        return None
+
+
+async def run_load(args: argparse.Namespace, server_pid: Optional[int]) -> Dict:
+    generator = LoadGenerator(args)
+    sampler = MemorySampler(server_pid)
+    sampling = asyncio.ensure_future(sampler.run())
+    try:
+        wall_time = await generator.run()
+    finally:
+        sampling.cancel()
+
+    report = generator.report(wall_time)
+    report['server_memory'] = sampler.report()
+    report['site'] = await _site_stats(args.site_ports[0])
+    return report
+
+
+def _megabytes(value: Optional[int]) -> str:
+    return f"{value / 1e6:.1f} MB" if value is not None else 'n/a'
+
+
+def _milliseconds(value: Optional[float]) -> str:
+    return f"{value * 1000:.1f} ms" if value is not None else 'n/a'
+
+
+def print_report(report: Dict) -> None:
+    latency = report['latency_seconds']
+    memory = report['server_memory']
+    print(f"Requests:   {report['requests']} in {report['wall_seconds']:.1f}s "
+          f"({report['requests_per_sec']:.1f} req/s, {report['ok_per_sec']:.1f} ok/s)")
+    print(f"Statuses:   {', '.join(f'{status}: {count}' for status, count in report['statuses'].items())}")
+    print(f"Latency:    p50 {_milliseconds(latency['p50'])}, p95 {_milliseconds(latency['p95'])}, "
+          f"p99 {_milliseconds(latency['p99'])} (min {_milliseconds(latency['min'])}, max {_milliseconds(latency['max'])})")
+    print(f"Server RSS: start {_megabytes(memory['rss_start_bytes'])}, end {_megabytes(memory['rss_end_bytes'])}, "
+          f"peak {_megabytes(memory['rss_peak_bytes'])}")
+    if report['site']:
+        site = report['site']
+        print(f"Site:       {site['pages']} pages, {site['files']} files, {site['errors']} errors served")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the scraping API against a local synthetic website.')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent clients (default: %(default)s)')
+    parser.add_argument('--requests', type=int, default=200, help='Total requests to send (default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=0, help='Send requests for this many seconds instead of a fixed count')
+    parser.add_argument('--endpoint', choices=ENDPOINTS, default='scrape', help='API endpoint to call (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=120, help='Client timeout per request in seconds (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for picking seed pages (default: %(default)s)')
+    parser.add_argument('--hosts', type=int, default=2, help='Synthetic hosts, one port each (default: %(default)s)')
+    parser.add_argument('--site-port', type=int, default=8900, help='First synthetic site port (default: %(default)s)')
+    parser.add_argument('--server-port', type=int, default=4100, help='Port for the API server started by the harness (default: %(default)s)')
+    parser.add_argument('--server-url', help='Use an API server that is already running instead of starting one')
+    parser.add_argument('--server-workers', type=int, default=1, help='Worker processes for the API server started by the harness; memory is then sampled from the parent only (default: %(default)s)')
+    parser.add_argument('--server-pid', type=int, help='With --server-url, the server process to sample memory from')
+    parser.add_argument('--server-env', action='append', default=[], metavar='NAME=VALUE', help='Environment for the started API server, e.g. SCRAPER_FETCH_MAX_CONCURRENCY=20 (repeatable)')
+    parser.add_argument('--polite', action='store_true', help="Keep the server's per-host politeness rate limits (lifted by default)")
+    parser.add_argument('--no-cache', action='store_true', help='Disable the API response and page caches (SCRAPER_CACHE_TTL=0)')
+    parser.add_argument('--json', metavar='PATH', help="Write machine-readable results to PATH ('-' for stdout)")
+    add_site_arguments(parser)
+    args = parser.parse_args()
+    args.site_ports = [args.site_port + i for i in range(args.hosts)]
+
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    processes = []
+    with open(os.path.join(workdir, 'processes.log'), 'w') as log:
+        try:
+            processes.append(start_site(args, log))
+            server_pid = args.server_pid
+            if not args.server_url:
+                server = start_server(args, workdir, log)
+                processes.append(server)
+                args.server_url = f"http://127.0.0.1:{args.server_port}"
+                server_pid = server.pid
+
+            report = asyncio.run(run_load(args, server_pid))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=10)
+
+    report = {
+        'environment': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'settings': {
+            name: value for name, value in vars(args).items() if name not in ('json',)
+        },
+        **report,
+    }
+
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+
+    print_report(report)
+    print(f"Server and site logs: {os.path.join(workdir, 'processes.log')}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""Offline micro-benchmarks for the parsing, link-extraction and conversion hot paths.
+
+Every stage runs against the checked-in corpus for both MarkdownConverter
+(the API) and MarkdownCrawler (the CLI) with each available parser backend.
+The script reports pages/sec, MB/sec and peak memory per stage. A full run
+takes about ten minutes, mostly html.parser and the tracemalloc pass on the
+multi-megabyte page; narrow it with --target, --parser, --stage, --fixture
+or --no-memory. Use --json to save the results and --compare to diff them
+against an earlier run:
+
+    python benchmarks/microbench.py --json before.json
+    python benchmarks/microbench.py --compare before.json
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document import PARSERS, lxml, parse_html, to_markdown  # noqa: E402
+from html_to_markdown_converter import MarkdownCrawler  # noqa: E402
+from main import MarkdownConverter  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+TARGETS = ('converter', 'crawler')
+
+# Runs slower than this are timed without a separate warm-up run
+WARMUP_TIME = 1.0
+
+
+@dataclass
+class Fixture:
+    name: str
+    url: str
+    html: str
+    size: int  # Bytes of UTF-8 HTML
+
+
+@dataclass
+class Stage:
+    name: str
+    setup: Callable  # (target, fixture) -> argument passed to run, not timed
+    run: Callable  # (target, fixture, argument) -> None
+
+
+def _parsed(target, fixture: Fixture):
+    """Parsed tree for stages that only read it; parsing is timed by its own stage."""
+    key = (target.parser, fixture.name)
+    if key not in _documents:
+        _documents.clear()  # Keep only one large tree alive at a time
+        _documents[key] = parse_html(fixture.html, target.parser)
+    return _documents[key]
+
+
+def _uncleaned(target, fixture: Fixture):
+    document = _parsed(target, fixture)
+    document.removed = set()
+    return document
+
+
+def _unpruned(target, fixture: Fixture):
+    # Pruning runs on a cleaned tree, so only the main-content pass is timed
+    document = _uncleaned(target, fixture)
+    document.remove_tags(['script', 'style', 'iframe', 'noscript'])
+    return document
+
+
+def _reset_visited(target, fixture: Fixture) -> None:
+    # The converter starts each seed with only the seed visited; the crawler's visited set is its frontier
+    if isinstance(target, MarkdownConverter):
+        target.visited_urls = {fixture.url}
+
+
+def _setup_links(target, fixture: Fixture):
+    _reset_visited(target, fixture)
+    return _parsed(target, fixture)
+
+
+def _setup_analyze(target, fixture: Fixture):
+    _reset_visited(target, fixture)
+
+
+_documents: Dict[tuple, object] = {}
+
+STAGES = [
+    Stage('parse_html', lambda t, f: None, lambda t, f, _: parse_html(f.html, t.parser)),
+    Stage('_extract_links', _setup_links, lambda t, f, doc: t._extract_links(doc, f.url)),
+    Stage(
+        '_normalize_url',
+        lambda t, f: list(_parsed(t, f).hrefs()),
+        lambda t, f, hrefs: [t._normalize_url(f.url, href) for href in hrefs]
+    ),
+    Stage('_clean_html', _uncleaned, lambda t, f, doc: t._clean_html(doc)),
+    Stage('prune_boilerplate', _unpruned, lambda t, f, doc: doc.prune_boilerplate()),
+    Stage('to_markdown', lambda t, f: t._clean_html(_uncleaned(t, f)), lambda t, f, doc: to_markdown(doc, f.url)),
+    Stage('_convert_to_markdown', lambda t, f: None, lambda t, f, _: t._convert_to_markdown(f.html, f.url)),
+    Stage('_analyze_page', _setup_analyze, lambda t, f, _: t._analyze_page(f.html, f.url)),
+]
+
+
+def load_corpus(names: Optional[List[str]] = None) -> List[Fixture]:
+    with open(os.path.join(CORPUS_DIR, 'manifest.json')) as f:
+        manifest = json.load(f)
+
+    fixtures = []
+    for entry in manifest['fixtures']:
+        if names and entry['name'] not in names:
+            continue
+        with gzip.open(os.path.join(CORPUS_DIR, entry['file']), 'rt', encoding='utf-8') as f:
+            html = f.read()
+        fixtures.append(Fixture(entry['name'], entry['url'], html, len(html.encode('utf-8'))))
+    return fixtures
+
+
+def make_target(kind: str, parser: str, fixture: Fixture):
+    if kind == 'converter':
+        return MarkdownConverter(parser=parser)
+    return MarkdownCrawler(seed_url=fixture.url, parser=parser)
+
+
+def time_stage(stage: Stage, target, fixture: Fixture, repeat: int, max_time: float) -> float:
+    """Median wall time of one stage over up to repeat runs.
+
+    The first run is a discarded warm-up unless it took longer than WARMUP_TIME,
+    and repetition stops once max_time seconds have been spent on timed runs.
+    """
+    timings = []
+    warm = False
+    while len(timings) < repeat and (not timings or sum(timings) < max_time):
+        argument = stage.setup(target, fixture)
+        start = time.perf_counter()
+        stage.run(target, fixture, argument)
+        elapsed = time.perf_counter() - start
+
+        if warm or elapsed >= WARMUP_TIME:
+            timings.append(elapsed)
+        warm = True
+    return statistics.median(timings)
+
+
+def peak_memory(stage: Stage, target, fixture: Fixture) -> int:
+    """Peak bytes allocated by one run of a stage, as seen by tracemalloc."""
+    argument = stage.setup(target, fixture)
+    tracemalloc.start()
+    try:
+        stage.run(target, fixture, argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(fixtures: List[Fixture], targets: List[str], parsers: List[str], stages: List[Stage],
+                   repeat: int, max_time: float, measure_memory: bool, verbose: bool = False) -> List[Dict]:
+    results = []
+    for kind in targets:
+        for parser in parsers:
+            for fixture in fixtures:
+                for stage in stages:
+                    target = make_target(kind, parser, fixture)
+                    seconds = time_stage(stage, target, fixture, repeat, max_time)
+                    peak = peak_memory(stage, target, fixture) if measure_memory else None
+                    results.append({
+                        'target': kind,
+                        'parser': parser,
+                        'stage': stage.name,
+                        'fixture': fixture.name,
+                        'bytes': fixture.size,
+                        'seconds': seconds,
+                        'pages_per_sec': 1 / seconds if seconds else None,
+                        'mb_per_sec': fixture.size / 1e6 / seconds if seconds else None,
+                        'peak_bytes': peak,
+                    })
+                    if verbose:
+                        print(f"{kind:9} {parser:11} {stage.name:20} {fixture.name:18} {seconds * 1000:9.2f} ms", file=sys.stderr)
+    return results
+
+
+def summarize(results: List[Dict]) -> List[Dict]:
+    """Aggregate per-fixture results into corpus-wide throughput per target, parser and stage."""
+    groups: Dict[tuple, List[Dict]] = {}
+    for result in results:
+        groups.setdefault((result['target'], result['parser'], result['stage']), []).append(result)
+
+    summary = []
+    for (kind, parser, stage), rows in groups.items():
+        seconds = sum(row['seconds'] for row in rows)
+        size = sum(row['bytes'] for row in rows)
+        peaks = [row['peak_bytes'] for row in rows if row['peak_bytes'] is not None]
+        summary.append({
+            'target': kind,
+            'parser': parser,
+            'stage': stage,
+            'pages': len(rows),
+            'bytes': size,
+            'seconds': seconds,
+            'pages_per_sec': len(rows) / seconds if seconds else None,
+            'mb_per_sec': size / 1e6 / seconds if seconds else None,
+            'peak_bytes': max(peaks) if peaks else None,
+        })
+    return summary
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=CORPUS_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _package_version(name: str) -> Optional[str]:
+    from importlib import metadata
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment(repeat: int, max_time: float) -> Dict:
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'packages': {name: _package_version(name) for name in ('beautifulsoup4', 'html2text', 'lxml')},
+        'repeat': repeat,
+        'max_time': max_time,
+        'memory': 'tracemalloc peak; Python allocations only, lxml C tree memory is not counted',
+    }
+
+
+def _fixture_seconds(results: List[Dict]) -> Dict[tuple, Dict[tuple, float]]:
+    """Median seconds by target, parser and stage, then by corpus page (name and size)."""
+    seconds: Dict[tuple, Dict[tuple, float]] = {}
+    for row in results:
+        key = (row['target'], row['parser'], row['stage'])
+        seconds.setdefault(key, {})[(row['fixture'], row['bytes'])] = row['seconds']
+    return seconds
+
+
+def print_summary(summary: List[Dict], results: List[Dict], baseline: Optional[Dict] = None) -> None:
+    current = _fixture_seconds(results)
+    previous = _fixture_seconds(baseline['results']) if baseline else {}
+
+    header = f"{'target':9} {'parser':11} {'stage':20} {'pages/s':>9} {'MB/s':>8} {'peak MB':>8}"
+    if previous:
+        header += f" {'vs base':>8}"
+    print(header)
+    print('-' * len(header))
+
+    for row in summary:
+        peak = f"{row['peak_bytes'] / 1e6:8.1f}" if row['peak_bytes'] is not None else f"{'-':>8}"
+        line = (
+            f"{row['target']:9} {row['parser']:11} {row['stage']:20} "
+            f"{row['pages_per_sec']:9.1f} {row['mb_per_sec']:8.2f} {peak}"
+        )
+        key = (row['target'], row['parser'], row['stage'])
+        before = previous.get(key, {})
+        shared = before.keys() & current[key].keys()
+        if shared:
+            # Speedup of the time over the pages both runs measured; above 1.00x is faster than the baseline
+            speedup = sum(before[page] for page in shared) / sum(current[key][page] for page in shared)
+            line += f" {speedup:7.2f}x"
+        elif previous:
+            line += f" {'new':>8}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parsing, link extraction and conversion on the offline corpus.')
+    parser.add_argument('--target', action='append', choices=TARGETS, help='Benchmark only this class (repeatable; default: both)')
+    parser.add_argument('--parser', action='append', choices=PARSERS, help='Benchmark only this parser backend (repeatable; default: all installed)')
+    parser.add_argument('--stage', action='append', choices=[stage.name for stage in STAGES], help='Benchmark only this stage (repeatable)')
+    parser.add_argument('--fixture', action='append', help='Benchmark only this corpus page (repeatable)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement; the median is reported (default: 5)')
+    parser.add_argument('--max-time', type=float, default=10.0, help='Stop repeating a measurement after this many seconds (default: 10)')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc peak memory pass')
+    parser.add_argument('--json', metavar='PATH', help="Write machine-readable results to PATH ('-' for stdout)")
+    parser.add_argument('--compare', metavar='PATH', help='Show speedups against results saved earlier with --json, over the corpus pages both runs measured')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print every measurement to stderr')
+    args = parser.parse_args()
+
+    # The app and crawler modules log at INFO; keep the report readable
+    logging.getLogger().setLevel(logging.WARNING)
+
+    parsers = args.parser or [name for name in PARSERS if name != 'lxml' or lxml is not None]
+    stages = [stage for stage in STAGES if not args.stage or stage.name in args.stage]
+    fixtures = load_corpus(args.fixture)
+    if not fixtures:
+        parser.error('no corpus pages selected')
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['environment']['repeat'] != args.repeat:
+            print(
+                f"Warning: the baseline took medians of up to {baseline['environment']['repeat']} runs, "
+                f"this run of up to {args.repeat}", file=sys.stderr
+            )
+
+    results = run_benchmarks(fixtures, args.target or list(TARGETS), parsers, stages, args.repeat, args.max_time, not args.no_memory, args.verbose)
+    report = {
+        'environment': environment(args.repeat, args.max_time),
+        'corpus': [{'name': fixture.name, 'url': fixture.url, 'bytes': fixture.size} for fixture in fixtures],
+        'summary': summarize(results),
+        'results': results,
+    }
+
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"{len(fixtures)} pages, {sum(fixture.size for fixture in fixtures) / 1e6:.1f} MB, median of up to {args.repeat} runs")
+    if baseline:
+        pages = {(fixture.name, fixture.size) for fixture in fixtures}
+        shared = pages & {(page['name'], page['bytes']) for page in baseline['corpus']}
+        if shared != pages:
+            print(f"vs base covers {len(shared)} of {len(pages)} pages; the others are not in the baseline or changed size")
+    print_summary(report['summary'], results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""A local synthetic website for load tests: a deterministic page graph with configurable
+page sizes, latency, error and throttling rates, a robots.txt crawl delay,
+near-duplicate pages, non-HTML links, and ETags with pages that change between
+editions, for recrawl tests.
+
+Pages live at /p/<n> for n in range(pages). Each page links to other pages and,
+at the configured rate, to PDF and image files. Run it on several ports to
+simulate several hosts; every port serves the same graph with links spread
+across all of them.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+from dataclasses import dataclass
+from typing import Dict, List
+
+from aiohttp import web
+
+WORDS = (
+    'crawler markdown latency throughput page frontier parser document cache request '
+    'response header anchor content index archive network socket buffer stream queue'
+).split()
+
+
+@dataclass
+class SiteConfig:
+    pages: int = 200
+    links: int = 12  # Links per page
+    page_bytes: int = 20_000  # Approximate HTML size of each page
+    size_jitter: float = 0.5  # Page sizes vary by up to +-50%
+    latency_ms: float = 50.0  # Mean response delay
+    latency_jitter_ms: float = 25.0
+    error_rate: float = 0.0  # Fraction of page responses that fail with HTTP 500
+    throttle_rate: float = 0.0  # Fraction of page responses refused with HTTP 429 and Retry-After: 1
+    crawl_delay: float = 0.0  # Crawl-delay announced in robots.txt; 0 serves no robots.txt
+    non_html_rate: float = 0.1  # Fraction of links that point to PDF or image files
+    duplicate_rate: float = 0.0  # Fraction of pages that repeat another page's content under their own title
+    edition: int = 0  # Restart with another edition to change some pages, as if the site was updated
+    change_rate: float = 0.1  # Fraction of pages whose content differs from the previous edition
+    etags: bool = True  # Send ETags and answer If-None-Match with 304
+    file_bytes: int = 50_000
+    seed: int = 1
+
+
+class SyntheticSite:
+    """Generates pages lazily and serves them with simulated latency and failures."""
+
+    def __init__(self, config: SiteConfig, hosts: List[str]):
+        self.config = config
+        self.hosts = hosts  # host:port of every instance, used to spread links
+        self.random = random.Random(config.seed)
+        self.pages: Dict[int, str] = {}
+        self.served = {'pages': 0, 'not_modified': 0, 'files': 0, 'errors': 0, 'throttled': 0}
+
+    def _link(self, rng: random.Random) -> str:
+        host = rng.choice(self.hosts)
+        if rng.random() < self.config.non_html_rate:
+            n = rng.randrange(self.config.pages)
+            return f"http://{host}/files/{n}.pdf" if rng.random() < 0.5 else f"http://{host}/img/{n}.png"
+        return f"http://{host}/p/{rng.randrange(self.config.pages)}"
+
+    def page(self, n: int) -> str:
+        if n in self.pages:
+            return self.pages[n]
+
+        config = self.config
+        rng = random.Random(config.seed * 1_000_003 + n)
+        if rng.random() < config.duplicate_rate:
+            # A near-duplicate, like a print version: another page's links and text
+            rng = random.Random(config.seed * 1_000_003 + rng.randrange(config.pages))
+            rng.random()
+        target = int(config.page_bytes * (1 + rng.uniform(-config.size_jitter, config.size_jitter)))
+
+        links = ''.join(
+            f'<li><a href="{self._link(rng)}">{" ".join(rng.choices(WORDS, k=3))}</a></li>'
+            for _ in range(config.links)
+        )
+        parts = [
+            f'<!DOCTYPE html><html><head><title>Synthetic page {n}</title>'
+            f'<meta name="description" content="Synthetic page {n} for load testing">'
+            f'<style>body {{ font-family: sans-serif; }}</style>'
+            f'<script>var page = {n};</script></head><body>'
+            f'<h1>Page {n}</h1><nav><ul>{links}</ul></nav>'
+        ]
+        size = sum(len(part) for part in parts)
+        section = 0
+        while size < target:
+            section += 1
+            paragraph = ' '.join(rng.choices(WORDS, k=60))
+            part = f'<h2>Section {section}</h2><p>{paragraph} <strong>{rng.choice(WORDS)}</strong> {paragraph}</p>'
+            parts.append(part)
+            size += len(part)
+        if self._changed_since(n) is not None:
+            parts.append(f'<p>Updated in edition {self._changed_since(n)}.</p>')
+        parts.append('</body></html>')
+
+        self.pages[n] = ''.join(parts)
+        return self.pages[n]
+
+    def _changed_since(self, n: int):
+        """The latest edition, up to the current one, that changed page n, or None if none did."""
+        for edition in range(self.config.edition, 0, -1):
+            if random.Random(f"{self.config.seed}:{edition}:{n}").random() < self.config.change_rate:
+                return edition
+        return None
+
+    async def _delay(self) -> None:
+        config = self.config
+        delay = config.latency_ms + self.random.uniform(-config.latency_jitter_ms, config.latency_jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    async def handle_page(self, request: web.Request) -> web.Response:
+        await self._delay()
+        n = int(request.match_info['n'])
+        if not 0 <= n < self.config.pages:
+            raise web.HTTPNotFound()
+
+        if self.random.random() < self.config.error_rate:
+            self.served['errors'] += 1
+            raise web.HTTPInternalServerError()
+
+        if self.random.random() < self.config.throttle_rate:
+            self.served['throttled'] += 1
+            raise web.HTTPTooManyRequests(headers={'Retry-After': '1'})
+
+        text = self.page(n)
+        if not self.config.etags:
+            self.served['pages'] += 1
+            return web.Response(text=text, content_type='text/html')
+
+        etag = '"' + hashlib.sha1(text.encode()).hexdigest()[:16] + '"'
+        if request.headers.get('If-None-Match') == etag:
+            self.served['not_modified'] += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        self.served['pages'] += 1
+        return web.Response(text=text, content_type='text/html', headers={'ETag': etag})
+
+    async def handle_root(self, request: web.Request) -> web.Response:
+        raise web.HTTPFound('/p/0')
+
+    async def handle_file(self, request: web.Request) -> web.Response:
+        await self._delay()
+        self.served['files'] += 1
+        content_type = 'application/pdf' if request.path.endswith('.pdf') else 'image/png'
+        return web.Response(body=b'\0' * self.config.file_bytes, content_type=content_type)
+
+    async def handle_robots(self, request: web.Request) -> web.Response:
+        if not self.config.crawl_delay:
+            raise web.HTTPNotFound()
+        return web.Response(text=f"User-agent: *\nCrawl-delay: {self.config.crawl_delay:g}\n")
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.served)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/', self.handle_root)
+        app.router.add_get('/p/{n:\\d+}', self.handle_page)
+        app.router.add_get('/files/{name}', self.handle_file)
+        app.router.add_get('/img/{name}', self.handle_file)
+        app.router.add_get('/robots.txt', self.handle_robots)
+        app.router.add_get('/_stats', self.handle_stats)
+        return app
+
+
+async def serve(config: SiteConfig, host: str, ports: List[int]) -> None:
+    hosts = [f"{host}:{port}" for port in ports]
+    site = SyntheticSite(config, hosts)
+    runner = web.AppRunner(site.app(), access_log=None)
+    await runner.setup()
+    for port in ports:
+        await web.TCPSite(runner, host, port).start()
+    print(f"Synthetic site serving {config.pages} pages on {', '.join(hosts)}", flush=True)
+    await asyncio.Event().wait()
+
+
+def add_site_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = SiteConfig()
+    parser.add_argument('--pages', type=int, default=defaults.pages, help='Pages in the graph (default: %(default)s)')
+    parser.add_argument('--links', type=int, default=defaults.links, help='Links per page (default: %(default)s)')
+    parser.add_argument('--page-bytes', type=int, default=defaults.page_bytes, help='Approximate page size (default: %(default)s)')
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms, help='Mean response delay (default: %(default)s)')
+    parser.add_argument('--latency-jitter-ms', type=float, default=defaults.latency_jitter_ms, help='Delay jitter, +- (default: %(default)s)')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help='Fraction of pages answered with HTTP 500 (default: %(default)s)')
+    parser.add_argument('--throttle-rate', type=float, default=defaults.throttle_rate, help='Fraction of pages answered with HTTP 429 (default: %(default)s)')
+    parser.add_argument('--crawl-delay', type=float, default=defaults.crawl_delay, help='Crawl-delay to announce in robots.txt, 0 for none (default: %(default)s)')
+    parser.add_argument('--non-html-rate', type=float, default=defaults.non_html_rate, help='Fraction of links to PDF/image files (default: %(default)s)')
+    parser.add_argument('--duplicate-rate', type=float, default=defaults.duplicate_rate, help='Fraction of pages that are near-duplicates of another page (default: %(default)s)')
+    parser.add_argument('--edition', type=int, default=defaults.edition, help='Site edition; each one changes some pages (default: %(default)s)')
+    parser.add_argument('--change-rate', type=float, default=defaults.change_rate, help='Fraction of pages changed by each edition (default: %(default)s)')
+    parser.add_argument('--no-etags', dest='etags', action='store_false', help='Send no ETags, so clients must compare content')
+    parser.add_argument('--site-seed', type=int, default=defaults.seed, help='Seed for the page graph (default: %(default)s)')
+
+
+def site_config(args: argparse.Namespace) -> SiteConfig:
+    return SiteConfig(
+        pages=args.pages,
+        links=args.links,
+        page_bytes=args.page_bytes,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        crawl_delay=args.crawl_delay,
+        non_html_rate=args.non_html_rate,
+        duplicate_rate=args.duplicate_rate,
+        edition=args.edition,
+        change_rate=args.change_rate,
+        etags=args.etags,
+        seed=args.site_seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic website for load tests.')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, action='append', help='Port to listen on; repeat to simulate several hosts (default: 8900)')
+    add_site_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(site_config(args), args.host, args.port or [8900]))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class AsyncTTLCache:
+    """In-memory cache with TTL expiry, LRU eviction and single-flight loading.
+
+    Concurrent lookups of a missing key share one load; loads that fail or
+    return None are not cached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 0,
+        ttl: float = 300,
+        sizeof: Callable[[Any], int] = lambda value: 0
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes  # 0 disables the size limit
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, size, value)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _store(self, key: str, value: Any) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        size = self.sizeof(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+
+        # Evict least recently used entries until both limits hold
+        while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _finish_load(self, key: str, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            self._store(key, task.result())
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, loading it at most once at a time."""
+        value = self._lookup(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_load(key, done))
+
+        # Shield the shared load so one caller going away does not cancel it for the rest
+        return await asyncio.shield(task)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None without loading it."""
+        value = self._lookup(key)
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def loading(self, key: str) -> Optional[asyncio.Future]:
+        """Return the load of key in flight in get_or_load(), or None; shield it before awaiting."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        return task
+
+    def put(self, key: str, value: Any) -> None:
+        """Cache a value loaded outside get_or_load()."""
+        self._store(key, value)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,83 @@
+import codecs
+import logging
+import re
+from typing import Optional
+
+try:
+    import charset_normalizer
+except ImportError:  # Detection is a last resort; without it undecodable bytes are replaced
+    charset_normalizer = None
+
+logger = logging.getLogger(__name__)
+
+# Byte order marks, longest first so UTF-32 is not mistaken for UTF-16
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+# Browsers only look for a <meta> charset in the first 1024 bytes
+META_PRESCAN_BYTES = 1024
+_META_CHARSET = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_:.+-]+)',
+    re.IGNORECASE
+)
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?\s*([^\s;"\']+)', re.IGNORECASE)
+
+
+def _codec(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip()).name
+    except LookupError:
+        logger.debug(f"Ignoring unknown charset: {name}")
+        return None
+
+
+def header_encoding(content_type: str) -> Optional[str]:
+    match = _HEADER_CHARSET.search(content_type or '')
+    return _codec(match.group(1)) if match else None
+
+
+def meta_encoding(body: bytes) -> Optional[str]:
+    match = _META_CHARSET.search(body[:META_PRESCAN_BYTES])
+    if not match:
+        return None
+    encoding = _codec(match.group(1).decode('ascii'))
+    # A page that could be read to find this tag is not UTF-16, whatever it claims
+    if encoding and encoding.startswith('utf-16'):
+        return 'utf-8'
+    return encoding
+
+
+def decode_html(body: bytes, content_type: str = '') -> str:
+    """Decode an HTML body, resolving its charset as cheaply as possible.
+
+    The BOM wins, then the Content-Type charset, then a <meta> charset in the
+    first kilobyte. Without any of those, UTF-8 is tried before running
+    charset detection over the whole body.
+    """
+    for bom, encoding in _BOMS:
+        if body.startswith(bom):
+            return body[len(bom):].decode(encoding, errors='replace')
+
+    encoding = header_encoding(content_type) or meta_encoding(body)
+    if encoding:
+        return body.decode(encoding, errors='replace')
+
+    try:
+        # Not final, so a character cut off by the download size cap is dropped rather than fatal
+        return codecs.getincrementaldecoder('utf-8')().decode(body, final=False)
+    except UnicodeDecodeError:
+        pass
+
+    if charset_normalizer is not None:
+        best = charset_normalizer.from_bytes(body).best()
+        if best is not None:
+            return str(best)
+
+    return body.decode('windows-1252', errors='replace')
@@ -0,0 +1,109 @@
+import os
+
+from dotenv import load_dotenv
+
+# Settings can be overridden with environment variables or a .env file
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return value.lower() in ('1', 'true', 'yes', 'on') if value else default
+
+
+# API server. Each worker process runs at most the max active scrapes at once and queues
+# up to the max queued more; those that find the queue full or wait longer than the queue
+# timeout are refused with 503. On shutdown, requests in flight get the shutdown timeout to finish
+SERVER_HOST = os.getenv('SCRAPER_HOST', '0.0.0.0')
+SERVER_PORT = _env_int('SCRAPER_PORT', 4000)
+SERVER_WORKERS = _env_int('SCRAPER_WORKERS', 1)
+MAX_ACTIVE_SCRAPES = _env_int('SCRAPER_MAX_ACTIVE_SCRAPES', 16)
+MAX_QUEUED_SCRAPES = _env_int('SCRAPER_MAX_QUEUED_SCRAPES', 64)
+SCRAPE_QUEUE_TIMEOUT = _env_float('SCRAPER_SCRAPE_QUEUE_TIMEOUT', 10.0)
+SHUTDOWN_TIMEOUT = _env_float('SCRAPER_SHUTDOWN_TIMEOUT', 30.0)
+
+# Shared HTTP connection pool
+HTTP_MAX_CONNECTIONS = _env_int('SCRAPER_HTTP_MAX_CONNECTIONS', 100)
+HTTP_MAX_CONNECTIONS_PER_HOST = _env_int('SCRAPER_HTTP_MAX_CONNECTIONS_PER_HOST', 8)
+HTTP_DNS_CACHE_TTL = _env_int('SCRAPER_HTTP_DNS_CACHE_TTL', 300)
+HTTP_KEEPALIVE_TIMEOUT = _env_float('SCRAPER_HTTP_KEEPALIVE_TIMEOUT', 30.0)
+
+# Related-page fetching
+FETCH_MAX_CONCURRENCY = _env_int('SCRAPER_FETCH_MAX_CONCURRENCY', 10)
+FETCH_PER_HOST_CONCURRENCY = _env_int('SCRAPER_FETCH_PER_HOST_CONCURRENCY', 6)
+FETCH_TIMEOUT = _env_int('SCRAPER_FETCH_TIMEOUT', 10)
+# Times a fetch answered with 429 or 503 is retried once the host's backoff has passed
+FETCH_RETRIES = _env_int('SCRAPER_FETCH_RETRIES', 2)
+# Response bodies are truncated after this many (decompressed) bytes; 0 disables the cap
+FETCH_MAX_BYTES = _env_int('SCRAPER_FETCH_MAX_BYTES', 10 * 1024 * 1024)
+
+# Per-host politeness: a token bucket per host, in requests per second, adapted to how the host responds
+POLITENESS_INITIAL_RATE = _env_float('SCRAPER_POLITENESS_INITIAL_RATE', 5.0)
+POLITENESS_MAX_RATE = _env_float('SCRAPER_POLITENESS_MAX_RATE', 20.0)
+POLITENESS_MIN_RATE = _env_float('SCRAPER_POLITENESS_MIN_RATE', 0.1)
+POLITENESS_BURST = _env_int('SCRAPER_POLITENESS_BURST', 10)
+# Responses faster than this (seconds to headers) speed a host up; slower than the slow limit slow it down
+POLITENESS_FAST_RESPONSE = _env_float('SCRAPER_POLITENESS_FAST_RESPONSE', 0.5)
+POLITENESS_SLOW_RESPONSE = _env_float('SCRAPER_POLITENESS_SLOW_RESPONSE', 5.0)
+# Backoff after 429/503 without Retry-After doubles up to this; fetches fail rather than wait longer than the max wait
+POLITENESS_MAX_BACKOFF = _env_float('SCRAPER_POLITENESS_MAX_BACKOFF', 60.0)
+POLITENESS_MAX_WAIT = _env_float('SCRAPER_POLITENESS_MAX_WAIT', 15.0)
+# robots.txt Crawl-delay and Request-rate are cached per host for this long; 0 ignores robots.txt
+ROBOTS_CACHE_TTL = _env_float('SCRAPER_ROBOTS_CACHE_TTL', 3600.0)
+ROBOTS_TIMEOUT = _env_float('SCRAPER_ROBOTS_TIMEOUT', 5.0)
+
+# Pages whose SimHash fingerprints differ in at most this many of 64 bits are near-duplicates; -1 disables the check
+NEAR_DUPLICATE_DISTANCE = _env_int('SCRAPER_NEAR_DUPLICATE_DISTANCE', 3)
+
+# Crawl frontier: SQLite page cache in megabytes (the rest of the frontier stays on disk), and the
+# in-memory set of seen URLs, 64-bit fingerprints unless a Bloom filter error rate above 0 is set.
+# The Bloom filter is sized for the expected number of URLs and grows less accurate past it
+FRONTIER_CACHE_MB = _env_int('SCRAPER_FRONTIER_CACHE_MB', 32)
+FRONTIER_BLOOM_ERROR_RATE = _env_float('SCRAPER_FRONTIER_BLOOM_ERROR_RATE', 0.0)
+FRONTIER_EXPECTED_URLS = _env_int('SCRAPER_FRONTIER_EXPECTED_URLS', 10_000_000)
+
+# On-disk store of raw fetched pages, shared by the API and the crawler; empty disables it.
+# Stored pages younger than the max age are used instead of fetching; -1 uses them at any age
+PAGE_STORE_PATH = os.getenv('SCRAPER_PAGE_STORE', '')
+PAGE_STORE_MAX_AGE = _env_float('SCRAPER_PAGE_STORE_MAX_AGE', 3600.0)
+PAGE_STORE_COMPRESS_LEVEL = _env_int('SCRAPER_PAGE_STORE_COMPRESS_LEVEL', 6)
+
+# Latency budgets (deadline_ms): time kept back for building and sending the response, and the largest budget allowed
+DEADLINE_RESERVE_MS = _env_int('SCRAPER_DEADLINE_RESERVE_MS', 100)
+DEADLINE_MAX_MS = _env_int('SCRAPER_DEADLINE_MAX_MS', 120_000)
+
+# Batch scraping: seeds per request and fetches in flight across a whole batch
+BATCH_MAX_URLS = _env_int('SCRAPER_BATCH_MAX_URLS', 500)
+BATCH_MAX_CONCURRENCY = _env_int('SCRAPER_BATCH_MAX_CONCURRENCY', 32)
+
+# HTML parser backend for conversion: "auto" (lxml when installed), "html.parser" or "lxml"
+HTML_PARSER = os.getenv('SCRAPER_HTML_PARSER', 'auto')
+
+# Convert only each page's main content, pruning navigation, banners, sidebars and link lists by
+# landmark, class and id, and link and text density
+MAIN_CONTENT_ONLY = _env_bool('SCRAPER_MAIN_CONTENT_ONLY', False)
+
+# JSON responses are gzipped for clients that accept it once they reach this size
+GZIP_MIN_BYTES = _env_int('SCRAPER_GZIP_MIN_BYTES', 1024)
+GZIP_LEVEL = _env_int('SCRAPER_GZIP_LEVEL', 5)
+
+# CPU pool for HTML parsing and markdown conversion ("thread" or "process")
+CPU_POOL_KIND = os.getenv('SCRAPER_CPU_POOL_KIND', 'thread')
+CPU_POOL_SIZE = _env_int('SCRAPER_CPU_POOL_SIZE', os.cpu_count() or 1)
+
+# Scrape result and per-page markdown caches (0 bytes disables the size limit)
+CACHE_TTL = _env_float('SCRAPER_CACHE_TTL', 300.0)
+RESPONSE_CACHE_MAX_ENTRIES = _env_int('SCRAPER_RESPONSE_CACHE_MAX_ENTRIES', 128)
+RESPONSE_CACHE_MAX_BYTES = _env_int('SCRAPER_RESPONSE_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+PAGE_CACHE_MAX_ENTRIES = _env_int('SCRAPER_PAGE_CACHE_MAX_ENTRIES', 2048)
+PAGE_CACHE_MAX_BYTES = _env_int('SCRAPER_PAGE_CACHE_MAX_BYTES', 128 * 1024 * 1024)
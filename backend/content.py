@@ -0,0 +1,140 @@
+import re
+from typing import Any, List, NamedTuple
+
+# Blocks are judged on how much of their text is link text and how much text they hold
+# per element: menus, link lists and footers are mostly short links, articles are not
+MAX_LINK_DENSITY = 0.5
+MENU_LINK_DENSITY = 0.25
+MENU_TEXT_DENSITY = 10  # Characters per element
+MIN_LINKS = 3
+
+# A page left with less text than this was probably all links (an index or directory page); it is kept whole
+MIN_CONTENT_CHARS = 100
+
+# Class words that mark page chrome, unless the same class also names the content
+_CHROME_CLASS = re.compile(
+    r'(?:^|[^a-z])(?:nav|menu|sidebar|header|masthead|footer|breadcrumb|cookie|consent|gdpr|banner|'
+    r'newsletter|subscribe|signup|popup|modal|share|social|related|comment|promo|sponsor|advert|'
+    r'copyright|skip|toolbar|pagination)'
+)
+_CONTENT_CLASS = re.compile(r'(?:^|[^a-z])(?:article|content|main|post|entry|story|body|text|prose)')
+
+# Ids are often made from headings ("menus", "run-menu"), so only short ids that are chrome words count
+_CHROME_ID_WORDS = {
+    'nav', 'navbar', 'navigation', 'menu', 'sidebar', 'header', 'masthead', 'footer', 'breadcrumb',
+    'breadcrumbs', 'cookie', 'cookies', 'consent', 'banner', 'newsletter', 'toolbar',
+}
+_ID_WORD = re.compile(r'[a-z0-9]+')
+
+# Blocks with this much text outside links are kept whatever their class or id says
+MAX_HINTED_TEXT = 1000
+
+# Landmarks that are chrome wherever they appear; a header inside the main content holds its title
+_CHROME_TAGS = {'nav', 'aside', 'footer'}
+_CHROME_ROLES = {'navigation', 'banner', 'contentinfo', 'complementary'}
+_MAIN_TAGS = {'main', 'article'}
+
+# Blocks judged by class and id, and by density. Headings and inline elements are only removed
+# with their block; tables only by class, since a table of links is usually data, not a menu
+_HINTED_TAGS = {'div', 'section', 'ul', 'ol', 'dl', 'form', 'p', 'menu', 'center', 'table'}
+_DENSITY_TAGS = {'div', 'section', 'ul', 'ol', 'dl', 'form', 'p', 'li', 'menu', 'header', 'center'}
+
+
+class Block(NamedTuple):
+    """An element of a parsed page, listed in document order for boilerplate scoring."""
+    element: Any  # Backend element, returned as is for removal
+    parent: int  # Index of the enclosing block, -1 for the root
+    tag: str
+    classes: str  # Lowercased class attribute
+    id: str  # Lowercased id attribute
+    role: str  # Lowercased first ARIA role
+    text: int  # Characters of text directly inside the element, outside its child elements
+
+
+def _chrome_hint(block: Block) -> bool:
+    """Whether the block's class or id names page chrome such as a menu, banner or sidebar."""
+    if block.classes and _CHROME_CLASS.search(block.classes) and not _CONTENT_CLASS.search(block.classes):
+        return True
+    words = _ID_WORD.findall(block.id)
+    return len(words) <= 2 and any(word in _CHROME_ID_WORDS for word in words)
+
+
+def boilerplate(blocks: List[Block]) -> List[Any]:
+    """Pick the elements to prune so that only a page's main content is converted.
+
+    Removes navigation, header, footer and aside landmarks, elements whose class
+    or id names page chrome (menus, cookie banners, sidebars, share buttons),
+    and blocks that are mostly links or hold little text per element. The main
+    and article landmarks and their ancestors are never removed, and the page's
+    own choice of main content is trusted: inside it, blocks are only removed
+    as landmarks or by class and id. Returns the outermost elements to prune,
+    or nothing if pruning would leave almost no text.
+    """
+    count = len(blocks)
+    text = [block.text for block in blocks]
+    links = [0] * count
+    anchors = [0] * count
+    elements = [1] * count
+    in_link = [False] * count
+    in_main = [False] * count
+    holds_main = [False] * count
+
+    # Ancestor context first, in document order; then totals from the leaves up
+    for index, block in enumerate(blocks):
+        parent = block.parent
+        main = block.tag in _MAIN_TAGS or block.role == 'main'
+        in_link[index] = block.tag == 'a' or (parent >= 0 and in_link[parent])
+        in_main[index] = main or (parent >= 0 and in_main[parent])
+        holds_main[index] = main
+        if in_link[index]:
+            links[index] = block.text
+        if block.tag == 'a':
+            anchors[index] = 1
+
+    for index in range(count - 1, 0, -1):
+        parent = blocks[index].parent
+        if parent >= 0:
+            text[parent] += text[index]
+            links[parent] += links[index]
+            anchors[parent] += anchors[index]
+            elements[parent] += elements[index]
+            holds_main[parent] = holds_main[parent] or holds_main[index]
+
+    pruned = []
+    pruned_text = 0
+    removed = [False] * count
+    for index, block in enumerate(blocks):
+        parent = block.parent
+        if parent >= 0 and removed[parent]:
+            removed[index] = True
+            continue
+        if holds_main[index]:
+            continue
+
+        if block.tag in _CHROME_TAGS or block.role in _CHROME_ROLES:
+            chrome = True
+        elif block.tag == 'header':
+            chrome = not in_main[index]
+        elif block.tag in _HINTED_TAGS:
+            chrome = text[index] - links[index] < MAX_HINTED_TEXT and _chrome_hint(block)
+        else:
+            chrome = False
+
+        if (
+            not chrome and not in_main[index] and block.tag in _DENSITY_TAGS
+            and text[index] and anchors[index] >= MIN_LINKS
+        ):
+            link_density = links[index] / text[index]
+            text_density = text[index] / elements[index]
+            chrome = link_density > MAX_LINK_DENSITY or (
+                link_density > MENU_LINK_DENSITY and text_density < MENU_TEXT_DENSITY
+            )
+
+        if chrome:
+            removed[index] = True
+            pruned.append(block.element)
+            pruned_text += text[index]
+
+    if blocks and text[0] - pruned_text < MIN_CONTENT_CHARS:
+        return []
+    return pruned
@@ -0,0 +1,133 @@
+import logging
+import sqlite3
+import time
+from typing import Dict, Iterator, Optional
+
+import config
+from url_seen import new_seen_set
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+DUPLICATE = 'duplicate'  # Fetched, but a near-duplicate of a page already crawled
+
+# Fingerprints are unsigned 64-bit; SQLite integers are signed
+_SIGN_BIT = 1 << 63
+
+
+class CrawlFrontier:
+    """SQLite-backed crawl frontier of queued, in-flight and finished URLs.
+
+    Every URL ever added is kept, so the table doubles as the visited set.
+    With a file path the frontier survives crashes and can be resumed; the
+    default is a temporary database deleted on close. Either way only
+    SCRAPER_FRONTIER_CACHE_MB of it is held in memory, plus a compact set of
+    URL fingerprints (see url_seen) that answers most add() calls, which are
+    for links already seen, without a database lookup.
+    """
+
+    def __init__(self, path: str = '', seen=None):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(f'PRAGMA cache_size = {-config.FRONTIER_CACHE_MB * 1024}')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS urls (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                depth INTEGER NOT NULL,
+                priority INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                fingerprint INTEGER
+            )
+        ''')
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(urls)')]
+        if 'fingerprint' not in columns:
+            # State files from before content fingerprints were recorded
+            self._db.execute('ALTER TABLE urls ADD COLUMN fingerprint INTEGER')
+        self._db.execute('CREATE INDEX IF NOT EXISTS urls_queue ON urls (state, priority, seq)')
+        self._db.commit()
+
+        self._seen = seen if seen is not None else new_seen_set()
+        for (url,) in self._db.execute('SELECT url FROM urls'):
+            self._seen.add(url)
+
+    def add(self, url: str, depth: int, priority: Optional[int] = None) -> bool:
+        """Queue a URL unless it was seen before; returns True if it was new.
+
+        Lower priorities are crawled first and default to the depth (breadth-first).
+        The insert is committed together with the next pop() or finish().
+        With a Bloom filter as the seen set, a small share of new URLs is
+        taken for seen and skipped.
+        """
+        if not self._seen.add(url):
+            return False
+        cursor = self._db.execute(
+            'INSERT OR IGNORE INTO urls (url, depth, priority, state, updated_at) VALUES (?, ?, ?, ?, ?)',
+            (url, depth, depth if priority is None else priority, QUEUED, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def pop(self) -> Optional[tuple]:
+        """Claim the next queued URL and mark it in flight; returns (url, depth) or None."""
+        row = self._db.execute(
+            'SELECT seq, url, depth FROM urls WHERE state = ? ORDER BY priority, seq LIMIT 1',
+            (QUEUED,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        seq, url, depth = row
+        self._db.execute('UPDATE urls SET state = ?, updated_at = ? WHERE seq = ?', (IN_FLIGHT, time.time(), seq))
+        self._db.commit()
+        return url, depth
+
+    def finish(self, url: str, state: str = DONE, fingerprint: Optional[int] = None) -> None:
+        """Record the outcome of an in-flight URL along with any links added for it."""
+        if fingerprint is not None:
+            fingerprint = (fingerprint ^ _SIGN_BIT) - _SIGN_BIT
+        self._db.execute(
+            'UPDATE urls SET state = ?, updated_at = ?, fingerprint = ? WHERE url = ?',
+            (state, time.time(), fingerprint, url)
+        )
+        self._db.commit()
+
+    def fingerprints(self) -> Iterator[tuple]:
+        """Yield (url, fingerprint) for every finished page with a content fingerprint."""
+        rows = self._db.execute('SELECT url, fingerprint FROM urls WHERE state = ? AND fingerprint IS NOT NULL', (DONE,))
+        for url, fingerprint in rows:
+            yield url, (fingerprint + _SIGN_BIT) ^ _SIGN_BIT
+
+    def requeue_in_flight(self) -> int:
+        """Return URLs left in flight by an interrupted run to the queue."""
+        cursor = self._db.execute('UPDATE urls SET state = ? WHERE state = ?', (QUEUED, IN_FLIGHT))
+        self._db.commit()
+        return cursor.rowcount
+
+    def requeue_finished(self) -> int:
+        """Queue every finished URL again, at its original depth, for a new pass over the crawl."""
+        cursor = self._db.execute(
+            'UPDATE urls SET state = ?, updated_at = ? WHERE state IN (?, ?, ?)',
+            (QUEUED, time.time(), DONE, FAILED, DUPLICATE)
+        )
+        self._db.commit()
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        counts = {QUEUED: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0, DUPLICATE: 0}
+        for state, count in self._db.execute('SELECT state, COUNT(*) FROM urls GROUP BY state'):
+            counts[state] = count
+        return counts
+
+    def __contains__(self, url: str) -> bool:
+        if url not in self._seen:
+            return False
+        return self._db.execute('SELECT 1 FROM urls WHERE url = ?', (url,)).fetchone() is not None
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,41 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """A request ran out of its latency budget before it had anything to return."""
+
+
+class Deadline:
+    """The time by which a request must be answered, from a budget in milliseconds."""
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+class LatencyEstimate:
+    """A running estimate of how long an operation takes, for planning work within a deadline.
+
+    An exponentially weighted mean of recent durations, so it follows changes
+    in load without being thrown by a single outlier. None until the first
+    observation.
+    """
+
+    def __init__(self, weight: float = 0.2):
+        self.weight = weight  # Share of each new observation in the estimate
+        self.value: Optional[float] = None
+
+    def observe(self, seconds: float) -> None:
+        if self.value is None:
+            self.value = seconds
+        else:
+            self.value += self.weight * (seconds - self.value)
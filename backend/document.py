@@ -0,0 +1,308 @@
+import logging
+import re
+from typing import Iterator, Optional
+
+import html2text
+from bs4 import BeautifulSoup
+from bs4.element import PreformattedString, Tag
+
+from content import Block, boilerplate
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:  # lxml is optional; html.parser is always available
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+PARSERS = ('html.parser', 'lxml')
+
+# Characters the soup serializer escapes and html2text reads back as entities
+_ESCAPED_CHARS = re.compile(r'([&<>])')
+_ENTITY_NAMES = {'&': 'amp', '<': 'lt', '>': 'gt'}
+
+# Landmark elements and ARIA roles, mapped to the page region they mark
+_LANDMARK_TAGS = {'nav': 'nav', 'header': 'header', 'footer': 'footer', 'aside': 'aside', 'main': 'main', 'article': 'main'}
+_LANDMARK_ROLES = {'navigation': 'nav', 'banner': 'header', 'contentinfo': 'footer', 'complementary': 'aside', 'main': 'main'}
+
+
+def _landmark(tag: str, role: Optional[str]) -> Optional[str]:
+    roles = role.lower().split() if role else ()
+    if roles and roles[0] in _LANDMARK_ROLES:
+        return _LANDMARK_ROLES[roles[0]]
+    return _LANDMARK_TAGS.get(tag)
+
+
+def _block(element, parent: int, tag: str, text: int) -> Block:
+    get = element.get
+    classes, element_id, role = get('class'), get('id'), get('role')
+    roles = role.lower().split() if role else ()
+    return Block(
+        element, parent, tag,
+        classes.lower() if classes else '', element_id.lower() if element_id else '',
+        roles[0] if roles else '', text
+    )
+
+
+def resolve_parser(parser: str) -> str:
+    """Map a parser setting ('auto', 'html.parser' or 'lxml') to an available backend."""
+    if parser == 'auto':
+        return 'lxml' if lxml is not None else 'html.parser'
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown HTML parser: {parser}")
+    if parser == 'lxml' and lxml is None:
+        logger.warning("lxml is not installed, falling back to html.parser")
+        return 'html.parser'
+    return parser
+
+
+class _EventWriter:
+    """Feed tree events to html2text exactly as it would see them in serialized HTML.
+
+    Adjacent text nodes, including text on either side of a removed element,
+    are merged into one data event, because html2text's whitespace handling
+    depends on how text is chunked.
+    """
+
+    def __init__(self, h: html2text.HTML2Text):
+        self.h = h
+        self.pending = []
+
+    def text(self, text: str) -> None:
+        self.pending.append(text)
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+
+        text = ''.join(self.pending)
+        self.pending = []
+
+        if not _ESCAPED_CHARS.search(text):
+            self.h.handle_data(text)
+            return
+
+        # Escaped characters arrive as entity references, which html2text does not escape
+        for part in _ESCAPED_CHARS.split(text):
+            if part in _ENTITY_NAMES:
+                self.h.handle_entityref(_ENTITY_NAMES[part])
+            elif part:
+                self.h.handle_data(part)
+
+    def starttag(self, tag: str, attrs: list) -> None:
+        self.flush()
+        self.h.handle_starttag(tag, attrs)
+
+    def endtag(self, tag: str) -> None:
+        self.flush()
+        self.h.handle_endtag(tag)
+
+
+class SoupDocument:
+    """A page parsed with BeautifulSoup's pure-Python html.parser backend."""
+
+    def __init__(self, html: str):
+        # Keep attributes such as class as plain strings, the way html2text expects them
+        self.root = BeautifulSoup(html, 'html.parser', multi_valued_attributes=None)
+        self.removed = set()  # ids of elements skipped during conversion
+
+    def title(self) -> Optional[str]:
+        return self.root.title.string if self.root.title else None
+
+    def description(self) -> Optional[str]:
+        description = self.root.find('meta', {'name': 'description'})
+        return description.get('content') if description else None
+
+    def hrefs(self) -> Iterator[str]:
+        for anchor in self.root.find_all('a', href=True):
+            yield anchor.get('href', '')
+
+    def anchors(self) -> Iterator[tuple]:
+        """Yield (href, anchor text, enclosing landmark region or None) for each link."""
+        for anchor in self.root.find_all('a', href=True):
+            region = None
+            for parent in anchor.parents:
+                region = _landmark(parent.name, parent.get('role'))
+                if region:
+                    break
+            yield anchor.get('href', ''), ' '.join(anchor.get_text(' ').split()), region
+
+    def remove_tags(self, names) -> None:
+        for element in self.root.find_all(names):
+            self.removed.add(id(element))
+
+    def _blocks(self) -> list:
+        """Every element outside head and not yet removed, in document order."""
+        blocks = []
+        stack = [(self.root, -1)]
+        while stack:
+            element, parent = stack.pop()
+            index = len(blocks)
+            children = []
+            text = 0
+            for child in element.contents:
+                if isinstance(child, Tag):
+                    if child.name != 'head' and id(child) not in self.removed:
+                        children.append(child)
+                elif not isinstance(child, PreformattedString):
+                    text += len(child.strip())
+            blocks.append(_block(element, parent, element.name, text))
+            stack.extend((child, index) for child in reversed(children))
+        return blocks
+
+    def prune_boilerplate(self) -> None:
+        """Skip navigation, banners, sidebars and link lists during conversion (see content.boilerplate)."""
+        for element in boilerplate(self._blocks()):
+            self.removed.add(id(element))
+
+    def feed(self, h: html2text.HTML2Text) -> None:
+        """Replay the tree as parser events, without serializing it again."""
+        writer = _EventWriter(h)
+        stack = [(None, iter(self.root.contents))]
+
+        while stack:
+            tag, children = stack[-1]
+            child = next(children, None)
+
+            if child is None:
+                stack.pop()
+                if tag is not None:
+                    writer.endtag(tag.name)
+            elif isinstance(child, Tag):
+                if id(child) not in self.removed:
+                    writer.starttag(child.name, list(child.attrs.items()))
+                    stack.append((child, iter(child.contents)))
+            elif isinstance(child, PreformattedString):
+                # Comments, doctypes and other declarations produce no markdown but split text
+                writer.flush()
+            else:
+                writer.text(str(child))
+
+        writer.flush()
+
+
+class LxmlDocument:
+    """A page parsed with lxml's C HTML parser, several times faster on large pages."""
+
+    def __init__(self, html: str):
+        try:
+            self.root = lxml.html.document_fromstring(html)
+        except ValueError:
+            # Strings carrying an XML encoding declaration must be parsed as bytes
+            self.root = lxml.html.document_fromstring(
+                html.encode('utf-8'), parser=lxml.html.HTMLParser(encoding='utf-8')
+            )
+        except lxml.etree.ParserError:
+            # Empty documents
+            self.root = lxml.html.document_fromstring('<html></html>')
+        self.removed = set()
+
+    def title(self) -> Optional[str]:
+        title = self.root.find('.//title')
+        return title.text if title is not None else None
+
+    def description(self) -> Optional[str]:
+        for meta in self.root.iter('meta'):
+            if meta.get('name') == 'description':
+                return meta.get('content')
+        return None
+
+    def hrefs(self) -> Iterator[str]:
+        for anchor in self.root.iter('a'):
+            href = anchor.get('href')
+            if href is not None:
+                yield href
+
+    def anchors(self) -> Iterator[tuple]:
+        """Yield (href, anchor text, enclosing landmark region or None) for each link."""
+        for anchor in self.root.iter('a'):
+            href = anchor.get('href')
+            if href is None:
+                continue
+            region = None
+            for parent in anchor.iterancestors():
+                region = _landmark(parent.tag, parent.get('role'))
+                if region:
+                    break
+            yield href, ' '.join(anchor.text_content().split()), region
+
+    def remove_tags(self, names) -> None:
+        for element in self.root.iter(*names):
+            self.removed.add(element)
+
+    def _blocks(self) -> list:
+        """Every element outside head and not yet removed, in document order."""
+        blocks = []
+        stack = [(self.root, -1)]
+        while stack:
+            element, parent = stack.pop()
+            index = len(blocks)
+            children = []
+            text = len(element.text.strip()) if element.text else 0
+            for child in element:
+                # Tails are text of this element, even after a removed child or a comment
+                if child.tail:
+                    text += len(child.tail.strip())
+                if isinstance(child.tag, str) and child.tag != 'head' and child not in self.removed:
+                    children.append(child)
+            blocks.append(_block(element, parent, element.tag, text))
+            stack.extend((child, index) for child in reversed(children))
+        return blocks
+
+    def prune_boilerplate(self) -> None:
+        """Skip navigation, banners, sidebars and link lists during conversion (see content.boilerplate)."""
+        for element in boilerplate(self._blocks()):
+            self.removed.add(element)
+
+    def feed(self, h: html2text.HTML2Text) -> None:
+        """Replay the tree as parser events: each element, then its text, children and tail."""
+        writer = _EventWriter(h)
+        stack = [(self.root, False)]
+
+        while stack:
+            element, closing = stack.pop()
+
+            if closing:
+                writer.endtag(element.tag)
+            elif not isinstance(element.tag, str):
+                # Comments and processing instructions produce no markdown but split text
+                writer.flush()
+            elif element not in self.removed:
+                writer.starttag(element.tag, list(element.attrib.items()))
+                if element.text:
+                    writer.text(element.text)
+
+                stack.append((element, True))
+                stack.extend((child, False) for child in reversed(element))
+                continue
+
+            if element.tail:
+                writer.text(element.tail)
+
+        writer.flush()
+
+
+def parse_html(html: str, parser: str = 'html.parser'):
+    """Parse HTML once into a document shared by every analysis step."""
+    if resolve_parser(parser) == 'lxml':
+        return LxmlDocument(html)
+    return SoupDocument(html)
+
+
+def to_markdown(document, url: str) -> str:
+    """Convert a parsed (and cleaned) document to Markdown in one pass over its tree."""
+    # Configure HTML2Text; instances are cheap to build (~10µs), so one per page
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.ignore_images = False
+    h.body_width = 0  # Don't wrap text
+    h.unicode_snob = True  # Use Unicode instead of ASCII
+
+    # Convert the tree to markdown, as HTML2Text.handle() does for a string
+    h.start = True
+    document.feed(h)
+    markdown = h.optwrap(h.finish())
+
+    # Add source URL as HTML comment at the top
+    return f"<!-- {url} -->\n{markdown}"
@@ -0,0 +1,43 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CpuExecutor:
+    """Run CPU-heavy parsing and conversion work on a bounded worker pool.
+
+    Thread pools share the interpreter with the event loop; process pools
+    scale across cores but require picklable callables and arguments.
+    """
+
+    def __init__(self, kind: str = 'thread', max_workers: Optional[int] = None):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown CPU pool kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[Executor] = None
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            logger.info(f"Starting {self.kind} pool with {self.max_workers} workers")
+            if self.kind == 'process':
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='cpu')
+        return self._pool
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run func(*args, **kwargs) on the pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(), functools.partial(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
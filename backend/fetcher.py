@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import logging
+import time
+import urllib.parse
+from typing import Dict, NamedTuple, Optional
+
+import aiohttp
+
+import config
+from charset import decode_html
+from http_client import get_session
+from metrics import ERRORS, FETCHED_BYTES, FETCHES, PAGES_SKIPPED, STAGE_SECONDS, error_type
+from page_store import PageStore, StoredPage, call_store, get_page_store
+from politeness import THROTTLE_STATUSES, HostThrottled, PolitenessScheduler, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+
+# Bodies are streamed in chunks of this size so the size cap applies while downloading
+READ_CHUNK_BYTES = 64 * 1024
+
+# How a fetched page compares with its copy in the page store
+NEW = 'new'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+
+# Content types of pages that can be scraped as a seed; a response without one is accepted as HTML
+MARKUP_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'application/xml', 'text/xml')
+
+
+class UnsupportedContentType(aiohttp.ClientError):
+    """A seed page is not HTML, as its Content-Type tells before the body is downloaded."""
+
+    def __init__(self, url: str, content_type: str):
+        super().__init__(f"{url} is not an HTML page (Content-Type: {content_type})")
+        self.url = url
+        self.content_type = content_type
+
+
+def _check_markup(url: str, content_type: str) -> None:
+    if content_type and not content_type.lower().startswith(MARKUP_CONTENT_TYPES):
+        PAGES_SKIPPED.inc(reason='non_html')
+        raise UnsupportedContentType(url, content_type)
+
+
+class FetchedPage(NamedTuple):
+    text: str
+    digest: str  # SHA-256 of the raw body, hex
+    change: str  # NEW, CHANGED or UNCHANGED since the page was last stored
+    content_type: str = ''
+    stored: bool = False  # Read from the page store without a request
+
+
+class AsyncFetcher:
+    """Fetch pages concurrently under a global limit and per-host politeness limits.
+
+    Connections come from the shared pool in http_client, so fetchers created
+    per request still reuse keep-alive connections. When each request may start
+    is up to a PolitenessScheduler, by default the process-wide one. With a
+    PageStore, recently stored pages are read from disk instead of fetched,
+    older ones are revalidated with If-None-Match and If-Modified-Since, and
+    every download is stored.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = config.FETCH_MAX_CONCURRENCY,
+        per_host_concurrency: int = config.FETCH_PER_HOST_CONCURRENCY,
+        timeout: int = config.FETCH_TIMEOUT,
+        user_agent: str = DEFAULT_USER_AGENT,
+        max_bytes: int = config.FETCH_MAX_BYTES,
+        scheduler: Optional[PolitenessScheduler] = None,
+        retries: int = config.FETCH_RETRIES,
+        store: Optional[PageStore] = None,
+        store_max_age: float = config.PAGE_STORE_MAX_AGE
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency  # Simultaneous requests allowed to one host
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.max_bytes = max_bytes  # Bodies are cut off after this many bytes; 0 means no limit
+        self.scheduler = scheduler  # Per-host rate limits; None uses the process-wide scheduler
+        self.retries = retries  # Retries for 429 and 503 responses
+        self.store = store  # Raw page store; None uses the process-wide one, if configured
+        self.store_max_age = store_max_age  # Stored pages younger than this are not fetched again; -1 for any age
+        self.headers = {
+            'User-Agent': user_agent,
+            'Accept': 'text/html,application/xhtml+xml,application/xml',
+        }
+        self._global_slots = asyncio.Semaphore(max_concurrency)
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_slots[host]
+
+    def page_store(self) -> Optional[PageStore]:
+        """The page store this fetcher reads and writes, if any."""
+        return self.store if self.store is not None else get_page_store()
+
+    async def _get(self, url: str, html_only: bool) -> Optional[FetchedPage]:
+        store = self.page_store()
+        stored = None
+        if store is not None:
+            stored = await call_store(store.load, url)
+            if stored is not None and self._is_fresh(stored[0]):
+                return self._stored_page(url, html_only, *stored, outcome='stored')
+
+        host = urllib.parse.urlsplit(url).netloc
+        scheduler = self.scheduler or get_scheduler()
+
+        # Wait for a host slot and the host's politeness delay before taking a
+        # global slot, so requests held back by one host never hold up others
+        async with self._host_semaphore(host):
+            attempt = 0
+            while True:
+                try:
+                    await scheduler.acquire(url)
+                    async with self._global_slots:
+                        logger.info(f"Fetching: {url}")
+                        return await self._download(url, html_only, scheduler, store, stored)
+                except UnsupportedContentType:
+                    raise
+                except aiohttp.ClientResponseError as e:
+                    if e.status in THROTTLE_STATUSES and attempt < self.retries:
+                        attempt += 1
+                        logger.info(f"Retrying {url} after HTTP {e.status} (attempt {attempt} of {self.retries})")
+                        continue
+                    self._record_error(e)
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if not isinstance(e, HostThrottled):
+                        scheduler.record(url, None, 0.0)
+                    self._record_error(e)
+                    raise
+
+    @staticmethod
+    def _record_error(error: BaseException) -> None:
+        FETCHES.inc(outcome='error')
+        ERRORS.inc(type=error_type(error))
+
+    def _is_fresh(self, page: StoredPage) -> bool:
+        return self.store_max_age < 0 or time.time() - page.fetched_at <= self.store_max_age
+
+    @staticmethod
+    def _stored_page(url: str, html_only: bool, page: StoredPage, body: bytes, outcome: str) -> Optional[FetchedPage]:
+        if html_only and not page.content_type.startswith('text/html'):
+            PAGES_SKIPPED.inc(reason='non_html')
+            return None
+        if not html_only:
+            _check_markup(url, page.content_type)
+        logger.info(f"Loaded {url} from the page store ({page.size} bytes)")
+        FETCHES.inc(outcome=outcome)
+        return FetchedPage(
+            decode_html(body, page.content_type), page.digest, UNCHANGED, page.content_type, outcome == 'stored'
+        )
+
+    @staticmethod
+    def _validators(page: StoredPage) -> Dict[str, str]:
+        """Conditional request headers that let the server answer 304 if the stored copy is current."""
+        headers = {}
+        if page.etag:
+            headers['If-None-Match'] = page.etag
+        if page.last_modified:
+            headers['If-Modified-Since'] = page.last_modified
+        return headers
+
+    async def _download(
+        self,
+        url: str,
+        html_only: bool,
+        scheduler: PolitenessScheduler,
+        store: Optional[PageStore],
+        stored: Optional[tuple]
+    ) -> Optional[FetchedPage]:
+        headers = self.headers
+        if stored is not None:
+            headers = {**self.headers, **self._validators(stored[0])}
+
+        start = time.perf_counter()
+        session = get_session()
+        async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            # The time to response headers tells the scheduler how loaded the host is
+            scheduler.record(url, response.status, time.perf_counter() - start, response.headers.get('Retry-After'))
+
+            if response.status == 304 and stored is not None:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage='download')
+                await call_store(
+                    store.touch, url, response.headers.get('ETag'), response.headers.get('Last-Modified')
+                )
+                logger.info(f"{url} not modified since it was stored")
+                return self._stored_page(url, html_only, *stored, outcome='not_modified')
+
+            response.raise_for_status()
+
+            # Check for HTML content from the headers, before any of the body is downloaded
+            content_type = response.headers.get('Content-Type', '')
+            if html_only and not content_type.startswith('text/html'):
+                logger.info(f"Skipping non-HTML content: {url}")
+                PAGES_SKIPPED.inc(reason='non_html')
+                return None
+            if not html_only:
+                _check_markup(url, content_type)
+
+            body, truncated = await self._read_body(response, url)
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage='download')
+            FETCHED_BYTES.inc(len(body))
+            FETCHES.inc(outcome='truncated' if truncated else 'ok')
+
+            if store is not None:
+                await call_store(
+                    store.save, url, body, content_type, response.status,
+                    response.headers.get('ETag'), response.headers.get('Last-Modified')
+                )
+
+            # Servers without validators still send the same bytes for an unchanged page
+            digest = hashlib.sha256(body).hexdigest()
+            if stored is None:
+                change = NEW
+            else:
+                change = UNCHANGED if digest == stored[0].digest else CHANGED
+
+            text = decode_html(body, content_type)
+            logger.info(f"Successfully fetched {url} - Status: {response.status}, Size: {len(body)} bytes")
+            return FetchedPage(text, digest, change, content_type)
+
+    async def _read_body(self, response: aiohttp.ClientResponse, url: str) -> tuple:
+        """Stream the body, stopping at max_bytes so huge or endless responses stay bounded.
+
+        Returns (body, truncated).
+        """
+        if not self.max_bytes:
+            return await response.read(), False
+
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+            body += chunk
+            if len(body) >= self.max_bytes:
+                # Leaving the rest unread makes aiohttp close the connection instead of draining it
+                logger.warning(f"Truncating {url} at {self.max_bytes} bytes")
+                del body[self.max_bytes:]
+                return bytes(body), True
+        return bytes(body), False
+
+    async def fetch_markup(self, url: str) -> FetchedPage:
+        """Fetch a seed page, raising on network and HTTP errors.
+
+        HTML and other markup is accepted; any other Content-Type raises
+        UnsupportedContentType without downloading the body.
+        """
+        return await self._get(url, html_only=False)
+
+    async def fetch_text(self, url: str) -> str:
+        """Fetch a seed page as fetch_markup() does and return its body."""
+        page = await self.fetch_markup(url)
+        return page.text
+
+    async def fetch_page(self, url: str, raise_errors: bool = False) -> Optional[FetchedPage]:
+        """Fetch a URL and return its HTML with its hash and whether it changed, or None for non-HTML content.
+
+        Network and HTTP errors also return None unless raise_errors is set.
+        """
+        try:
+            return await self._get(url, html_only=True)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if raise_errors:
+                raise
+            logger.warning(f"Error fetching {url}: {e}")
+            return None
+
+    async def fetch(self, url: str, raise_errors: bool = False) -> Optional[str]:
+        """Fetch a URL and return its HTML, or None for non-HTML content.
+
+        Network and HTTP errors also return None unless raise_errors is set.
+        """
+        page = await self.fetch_page(url, raise_errors)
+        return page.text if page is not None else None
@@ -0,0 +1,94 @@
+import hashlib
+import string
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+FINGERPRINT_BITS = 64
+
+# Words of three are hashed together, so pages sharing a vocabulary but not their text stay apart
+SHINGLE_WORDS = 3
+
+# Splitting the UTF-8 bytes after mapping ASCII punctuation to spaces (and ASCII letters to
+# lowercase) finds the same words as a regex, several times faster on large pages
+_WORD_BYTES = bytes.maketrans(
+    (string.punctuation + string.ascii_uppercase).encode(),
+    (' ' * len(string.punctuation) + string.ascii_lowercase).encode()
+)
+
+# int.bit_count is new in Python 3.10
+_popcount = getattr(int, 'bit_count', None) or (lambda value: bin(value).count('1'))
+
+
+def simhash(text: str) -> int:
+    """A 64-bit SimHash of the text's word shingles.
+
+    Texts that share most of their shingles get fingerprints that differ in
+    only a few bits, so near-duplicates can be found by Hamming distance.
+    """
+    words = text.encode('utf-8', errors='ignore').translate(_WORD_BYTES).split()
+
+    # Words are hashed with a keyless digest, since str hashes differ between processes;
+    # shingles then combine those with the tuple hash, which is stable for ints
+    word_hashes = {
+        word: int.from_bytes(hashlib.blake2b(word, digest_size=8).digest(), 'little')
+        for word in set(words)
+    }
+    hashes = list(map(word_hashes.__getitem__, words))
+    shingles = list(map(hash, zip(*(hashes[i:] for i in range(SHINGLE_WORDS)))))
+    if not shingles:
+        shingles = list(map(hash, hashes))
+    if not shingles:
+        return 0
+
+    # Each bit is set when most shingles have it set. The hashes are packed and each byte
+    # position read as one big integer, so a mask and a popcount count a bit over every
+    # shingle at once instead of looping over 64 bits of each shingle in Python
+    packed = array('q', shingles).tobytes()
+    total = len(shingles)
+    masks = [int.from_bytes(bytes([1 << bit]) * total, 'little') for bit in range(8)]
+    fingerprint = 0
+    for position in range(8):
+        column = int.from_bytes(packed[position::8], 'little')
+        for bit, mask in enumerate(masks):
+            if 2 * _popcount(column & mask) > total:
+                fingerprint |= 1 << (position * 8 + bit)
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class FingerprintIndex:
+    """Find earlier fingerprints within max_distance bits of a new one.
+
+    Fingerprints are split into max_distance + 1 bands; two fingerprints that
+    close must agree on at least one whole band, so only entries sharing a band
+    are compared. A negative max_distance disables matching.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        bands = max(max_distance + 1, 1)
+        width = -(-FINGERPRINT_BITS // bands)  # Round up so the bands cover every bit
+        self._bands = [(shift, (1 << width) - 1) for shift in range(0, FINGERPRINT_BITS, width)]
+        self._tables: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in self._bands]
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._tables[0].values()) if self._tables else 0
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        """Return the key of a near-duplicate of the fingerprint, if one was added."""
+        if self.max_distance < 0:
+            return None
+        for (shift, mask), table in zip(self._bands, self._tables):
+            for other, key in table.get(fingerprint >> shift & mask, ()):
+                if hamming_distance(fingerprint, other) <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, fingerprint: int, key: str) -> None:
+        if self.max_distance < 0:
+            return
+        for (shift, mask), table in zip(self._bands, self._tables):
+            table.setdefault(fingerprint >> shift & mask, []).append((fingerprint, key))
@@ -1,14 +1,25 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import logging
+import multiprocessing
+import queue
 import re
-import time
 import urllib.parse
-from collections import deque
+import zlib
+from collections import Counter
+from typing import Optional
 
-import requests
-from bs4 import BeautifulSoup
-import html2text
+from crawl_frontier import DONE, DUPLICATE, FAILED, QUEUED, CrawlFrontier
+import config
+from document import PARSERS, parse_html, resolve_parser, to_markdown
+from fetcher import CHANGED, NEW, UNCHANGED, AsyncFetcher
+from fingerprint import FingerprintIndex, simhash
+from http_client import close_session
+from page_store import PageStore, call_store
+from politeness import PolitenessScheduler
+from url_seen import new_seen_set
+from urls import LinkCandidate, canonicalize_url, rank_links
 
 # Configure logging
 logging.basicConfig(
@@ -18,6 +29,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# URLs the crawl (or each worker process) may have in flight at once
+WORKER_WINDOW = 8
+
+# How often the coordinator checks that its worker processes are alive while it waits for results
+RESULT_POLL_SECONDS = 1.0
+
+
+class WorkerDied(RuntimeError):
+    """A crawl worker process exited while pages were still assigned to it."""
+
 class MarkdownCrawler:
     """A mini-crawler that converts HTML pages to Markdown and prints to console."""
     
@@ -25,184 +46,495 @@ class MarkdownCrawler:
         self, 
         seed_url: str,
         max_links: int = 0, 
-        timeout: int = 10
+        timeout: int = 10,
+        max_depth: int = 1,
+        max_pages: int = 0,
+        state_path: Optional[str] = None,
+        workers: int = 1,
+        parser: str = config.HTML_PARSER,
+        near_duplicate_distance: int = config.NEAR_DUPLICATE_DISTANCE,
+        store_path: Optional[str] = None,
+        store_max_age: Optional[float] = None,
+        recrawl: bool = False,
+        bloom_error_rate: float = config.FRONTIER_BLOOM_ERROR_RATE,
+        expected_urls: int = config.FRONTIER_EXPECTED_URLS,
+        main_content_only: bool = config.MAIN_CONTENT_ONLY
     ):
         self.seed_url = seed_url
-        self.max_links = max_links  # Maximum number of links to process, 0 means only seed URL
+        self.max_links = max_links  # Maximum number of links to queue from each page, 0 means only seed URL
         self.timeout = timeout
+        self.max_depth = max_depth  # Links are followed from pages shallower than this depth
+        self.max_pages = max_pages  # Total pages to process across runs, 0 means no limit
+        self.workers = workers  # Worker processes; 1 crawls in this process
         self.user_agent = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        self.visited_urls = set()
-        self.queue = deque([(seed_url, True)])  # (url, is_seed) - True if it's the seed URL
+        self.parser = parser  # HTML parser backend: 'auto', 'html.parser' or 'lxml'
+        self.near_duplicate_distance = near_duplicate_distance  # Max differing fingerprint bits; -1 keeps duplicates
+        self.store_path = store_path  # Page store directory; None uses SCRAPER_PAGE_STORE, if set
+        self.main_content_only = main_content_only  # Prune page chrome before conversion
+        self.recrawl = recrawl  # Revisit every page of the state file and print only new and changed ones
+        if store_max_age is None:
+            # A recrawl asks the server about every page; it answers 304 for unchanged ones
+            store_max_age = 0 if recrawl else config.PAGE_STORE_MAX_AGE
+        self.store_max_age = store_max_age  # Stored pages younger than this are converted without fetching; -1 for any age
+        self.changes = Counter()  # Pages by how they compare with the stored copy: new, changed, unchanged or failed
+        self.changed_urls = []  # (change, url) for every new, changed and failed page
+        
+        # The frontier stores every queued, in-flight and finished URL, so it is also the visited set;
+        # with a state file the crawl survives interruption and resumes where it stopped. It is kept
+        # on disk either way, with seen URLs as fingerprints or in a Bloom filter in memory
+        seen = new_seen_set(bloom_error_rate, expected_urls)
+        self.frontier = CrawlFrontier(state_path or '', seen=seen)
+        self.visited_urls = self.frontier
+        
+        # Content fingerprints of the pages crawled so far, including by earlier runs;
+        # a recrawl visits those pages again, so it starts empty
+        self.fingerprints = FingerprintIndex(near_duplicate_distance)
+        if not recrawl:
+            for url, fingerprint in self.frontier.fingerprints():
+                self.fingerprints.add(fingerprint, url)
+        
+        resumed = self.frontier.requeue_in_flight()
+        resuming = False
+        if recrawl:
+            requeued = self.frontier.requeue_finished()
+            self.frontier.add(seed_url, depth=0)
+            if requeued:
+                logger.info(f"Recrawling {requeued + resumed} URLs from the state file")
+        else:
+            resuming = not self.frontier.add(seed_url, depth=0)
+        
+        # Pages processed so far, counted here once and then as results come in,
+        # so the page budget is checked without a query per page
+        counts = self.frontier.counts()
+        self.processed = counts[DONE] + counts[FAILED]
+        if resuming:
+            logger.info(
+                f"Resuming crawl: {self.processed} URLs processed, "
+                f"{counts[QUEUED]} queued ({resumed} were in flight)"
+            )
+    
+    def __getstate__(self) -> dict:
+        # Worker processes get a copy without the frontier; the coordinator dedupes links
+        state = self.__dict__.copy()
+        state['frontier'] = None
+        state['visited_urls'] = set()
+        state['fingerprints'] = None
+        return state
     
     def _clean_url(self, url: str) -> str:
-        """Remove tracking parameters from URL."""
-        # Simple query cleaning
-        if '?' in url:
-            base_url = url.split('?')[0]
-            return base_url
-        
-        return url
+        """Remove tracking parameters and fragments and put the URL in canonical form."""
+        return canonicalize_url(url)
     
     def _normalize_url(self, base_url: str, href: str) -> str:
         """Normalize relative URLs to absolute URLs."""
         if not href or href.startswith('#') or href.startswith('javascript:'):
             return None
             
-        # Convert relative URLs to absolute
-        abs_url = urllib.parse.urljoin(base_url, href)
-        
-        # Only keep https links
-        if not abs_url.startswith('https://'):
-            return None
+        try:
+            # Convert relative URLs to absolute
+            abs_url = urllib.parse.urljoin(base_url, href)
             
-        return self._clean_url(abs_url)
+            # Only keep https links
+            if not abs_url.startswith('https://'):
+                return None
+                
+            return self._clean_url(abs_url)
+        except ValueError:
+            # Malformed links, such as a port that is not a number, are skipped
+            return None
     
-    def _extract_links(self, soup: BeautifulSoup, base_url: str) -> list:
-        """Extract and normalize links from HTML."""
-        links = []
+    def _extract_links(self, document, base_url: str) -> list:
+        """Extract and normalize links from HTML, most promising first.
         
-        for anchor in soup.find_all('a', href=True):
-            href = anchor.get('href', '')
+        Links are not checked against the visited set here: worker processes
+        have none, stored analyses are reused by later runs, and the frontier
+        ignores URLs it already holds.
+        """
+        candidates = []
+        
+        for href, text, region in document.anchors():
             normalized_url = self._normalize_url(base_url, href)
             
-            if normalized_url and normalized_url not in self.visited_urls:
-                links.append(normalized_url)
-        
-        # Remove duplicates while preserving order
-        unique_links = []
-        seen = set()
-        for link in links:
-            if link not in seen:
-                seen.add(link)
-                unique_links.append(link)
+            if normalized_url:
+                candidates.append(LinkCandidate(normalized_url, text, region))
         
-        return unique_links
+        # Rank by site, position, anchor text and depth, so the page budget goes to content links
+        return rank_links(candidates, base_url)
     
-    def _clean_html(self, soup: BeautifulSoup) -> BeautifulSoup:
+    def _clean_html(self, document):
         """Clean HTML for better markdown conversion."""
-        # Remove unnecessary elements
-        for tag in ['script', 'style', 'iframe', 'noscript']:
-            for element in soup.find_all(tag):
-                if element:
-                    element.decompose()
+        # Remove unnecessary elements; they are skipped while converting
+        document.remove_tags(['script', 'style', 'iframe', 'noscript'])
+        if self.main_content_only:
+            document.prune_boilerplate()
         
-        return soup
+        return document
+    
+    def _convert_document(self, document, url: str) -> str:
+        """Convert a parsed page to clean Markdown."""
+        # Clean HTML before conversion
+        clean_document = self._clean_html(document)
+        
+        return to_markdown(clean_document, url)
     
     def _convert_to_markdown(self, html: str, url: str) -> str:
         """Convert HTML to clean Markdown."""
-        soup = BeautifulSoup(html, 'html.parser')
+        return self._convert_document(parse_html(html, self.parser), url)
+    
+    def _analyze_page(self, html: str, url: str) -> tuple:
+        """Parse a page once and extract its links and markdown."""
+        document = parse_html(html, self.parser)
         
-        # Clean HTML before conversion
-        clean_soup = self._clean_html(soup)
+        # Links are read before cleaning removes any elements
+        links = self._extract_links(document, url)
+        markdown = self._convert_document(document, url)
         
-        # Configure HTML2Text
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = False
-        h.body_width = 0  # Don't wrap text
-        h.unicode_snob = True  # Use Unicode instead of ASCII
+        return links, markdown
+    
+    def _conversion_variant(self) -> str:
+        """Name the settings that shape an analysis, so stored analyses are only reused under the same ones."""
+        fingerprinted = self.near_duplicate_distance >= 0
+        variant = f"{type(self).__name__}:{resolve_parser(self.parser)}:{'simhash' if fingerprinted else 'plain'}"
+        return variant + ':main' if self.main_content_only else variant
+    
+    async def _fetch_url(self, fetcher: AsyncFetcher, url: str) -> tuple:
+        """Fetch a URL and extract its markdown, links and content fingerprint.
         
-        # Convert HTML to markdown
-        markdown = h.handle(str(clean_soup))
+        Returns (markdown, links, fingerprint, change), where change is NEW,
+        CHANGED or UNCHANGED since the page was last stored. Unchanged pages
+        reuse the analysis kept in the page store instead of being parsed and
+        converted again.
+        """
+        page = await fetcher.fetch_page(url)
+        if not page or not page.text:
+            return None, [], None, None
         
-        # Add source URL as HTML comment at the top
-        markdown = f"<!-- {url} -->\n{markdown}"
+        store = fetcher.page_store()
+        variant = self._conversion_variant()
+        if store is not None and page.change == UNCHANGED:
+            analysis = await call_store(store.load_conversion, url, page.digest, variant)
+            if analysis is not None:
+                logger.info(f"Reusing the stored conversion of unchanged {url}")
+                return analysis["markdown"], analysis["links"], analysis["fingerprint"], UNCHANGED
         
-        return markdown
-    
-    def _fetch_url(self, url: str) -> tuple:
-        """Fetch a URL and extract HTML and links."""
-        logger.info(f"Fetching: {url}")
+        links, markdown = self._analyze_page(page.text, url)
+        fingerprint = simhash(markdown) if self.near_duplicate_distance >= 0 else None
         
-        headers = {
-            'User-Agent': self.user_agent,
-            'Accept': 'text/html,application/xhtml+xml,application/xml',
-        }
+        if store is not None:
+            analysis = {"markdown": markdown, "links": links, "fingerprint": fingerprint}
+            await call_store(store.save_conversion, url, page.digest, variant, analysis)
         
+        return markdown, links, fingerprint, page.change
+    
+    async def _process_url(self, fetcher: AsyncFetcher, url: str) -> tuple:
+        """Like _fetch_url(), but a page that raises is logged and reported as failed."""
         try:
-            response = requests.get(url, headers=headers, timeout=self.timeout)
-            response.raise_for_status()
-            
-            # Simple check for HTML content
-            content_type = response.headers.get('Content-Type', '')
-            if not content_type.startswith('text/html'):
-                logger.info(f"Skipping non-HTML content: {url}")
-                return None, []
-            
-            logger.info(f"Successfully fetched {url} - Status: {response.status_code}, Size: {len(response.text)} bytes")
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            links = self._extract_links(soup, url)
-            
-            return response.text, links
-            
-        except Exception as e:
-            logger.warning(f"Error fetching {url}: {e}")
-            return None, []
+            return await self._fetch_url(fetcher, url)
+        except Exception:
+            logger.exception(f"Error processing {url}")
+            return None, [], None, None
     
     def crawl(self) -> None:
         """Start the crawling process."""
-        link_count = 0  # Counter for additional links processed (not including seed)
+        if self.workers > 1:
+            self._crawl_parallel()
+        else:
+            asyncio.run(self._crawl())
+    
+    async def _crawl(self) -> None:
+        fetcher = self._new_fetcher()
+        try:
+            await self._crawl_with(fetcher)
+        finally:
+            await close_session()
+    
+    def _new_fetcher(self) -> AsyncFetcher:
+        """A fetcher for crawling: one request at a time per host, starting at one per second.
         
-        while self.queue:
-            url, is_seed = self.queue.popleft()
-            
-            # Skip if already visited
-            if url in self.visited_urls:
-                continue
-            
-            self.visited_urls.add(url)
-            
-            # Add polite delay
-            time.sleep(1)
+        The scheduler speeds up hosts that answer quickly and backs off from
+        hosts that are slow, throttle or ask for a crawl delay in robots.txt.
+        """
+        return AsyncFetcher(
+            max_concurrency=WORKER_WINDOW,
+            per_host_concurrency=1,
+            timeout=self.timeout,
+            user_agent=self.user_agent,
+            scheduler=PolitenessScheduler(initial_rate=1.0, burst=1),
+            store=PageStore(self.store_path) if self.store_path else None,
+            store_max_age=self.store_max_age
+        )
+    
+    async def _crawl_with(self, fetcher: AsyncFetcher) -> None:
+        """Crawl with several pages in flight, so a host waiting out its delay never holds up others."""
+        pending = {}  # task -> (seq, url, depth)
+        finished = {}  # seq -> (url, markdown), buffered until earlier pages are printed
+        next_seq = 0
+        next_to_print = 0
+        
+        while True:
+            while len(pending) < WORKER_WINDOW and (
+                not self.max_pages or self.processed + len(pending) < self.max_pages
+            ):
+                entry = self.frontier.pop()
+                if entry is None:
+                    break
+                url, depth = entry
+                
+                # Fetch URL and convert it to Markdown
+                task = asyncio.ensure_future(self._process_url(fetcher, url))
+                pending[task] = (next_seq, url, depth)
+                next_seq += 1
             
-            # Fetch URL
-            html, links = self._fetch_url(url)
+            if not pending:
+                break
             
-            if html:
-                # Convert HTML to Markdown
-                markdown = self._convert_to_markdown(html, url)
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                seq, url, depth = pending.pop(task)
+                markdown, links, fingerprint, change = task.result()
+                if not self._record_result(url, depth, markdown, links, fingerprint, change):
+                    markdown = None
+                finished[seq] = (url, markdown)
+            next_to_print = self._print_in_order(finished, next_to_print)
+        
+        self._print_summary()
+    
+    def _print_summary(self) -> None:
+        duplicates = self.frontier.counts()[DUPLICATE]
+        skipped = f" Skipped {duplicates} near-duplicate pages." if duplicates else ""
+        print(f"Crawling complete. Processed {self.processed} URLs.{skipped}")
+        
+        if self.recrawl:
+            print(
+                f"Recrawl: {self.changes[CHANGED]} changed, {self.changes[NEW]} new, "
+                f"{self.changes[UNCHANGED]} unchanged, {self.changes[FAILED]} failed."
+            )
+            for change, url in self.changed_urls:
+                print(f"  {change:<8} {url}")
+    
+    def _print_in_order(self, finished: dict, next_to_print: int) -> int:
+        """Print buffered results in dispatch order; returns the next sequence number to print."""
+        while next_to_print in finished:
+            url, markdown = finished.pop(next_to_print)
+            if markdown:
+                self._print_markdown(url, markdown)
+            next_to_print += 1
+        return next_to_print
+    
+    def _print_markdown(self, url: str, markdown: str) -> None:
+        # Print the markdown to console
+        print("\n" + "=" * 80)
+        print(f"MARKDOWN FOR URL: {url}")
+        print("=" * 80)
+        print(markdown)
+        print("=" * 80 + "\n")
+    
+    def _record_result(
+        self,
+        url: str,
+        depth: int,
+        markdown: Optional[str],
+        links: list,
+        fingerprint: Optional[int] = None,
+        change: Optional[str] = None
+    ) -> bool:
+        """Queue new links from a processed page and mark it finished in the frontier.
+        
+        Returns False for pages that should not be printed: failed pages,
+        near-duplicates of pages already crawled and, in a recrawl, pages that
+        did not change. Duplicates are not followed and do not count towards
+        max_pages.
+        """
+        if not markdown:
+            self.frontier.finish(url, FAILED)
+            self.processed += 1
+            self._record_change(FAILED, url)
+            return False
+        
+        if fingerprint is not None:
+            duplicate = self.fingerprints.find(fingerprint)
+            if duplicate:
+                logger.info(f"Skipping {url}: near-duplicate of {duplicate}")
+                self.frontier.finish(url, DUPLICATE)
+                return False
+            self.fingerprints.add(fingerprint, url)
+        
+        # Queue up to max_links new links from pages above the depth limit. In a recrawl, an
+        # unchanged page's links are in the state file from when it was first crawled, and the
+        # known links of a changed page count too, so it only adds links that are new among its best
+        if depth < self.max_depth and self.max_links > 0 and not (self.recrawl and change == UNCHANGED):
+            link_count = 0
+            for link in links:
+                if link_count >= self.max_links:
+                    break
+                
+                if self.frontier.add(link, depth=depth + 1) or self.recrawl:
+                    link_count += 1
+        
+        self.frontier.finish(url, DONE, fingerprint)
+        self.processed += 1
+        self._record_change(change, url)
+        return not (self.recrawl and change == UNCHANGED)
+    
+    def _record_change(self, change: Optional[str], url: str) -> None:
+        self.changes[change] += 1
+        if change != UNCHANGED:
+            self.changed_urls.append((change, url))
+    
+    def _shard(self, url: str) -> int:
+        """Pick the worker for a URL; every page of a host goes to the same worker."""
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        return zlib.crc32(host.encode()) % self.workers
+    
+    def _crawl_parallel(self) -> None:
+        """Coordinate worker processes: dispatch by host, dedupe links and print in order."""
+        context = multiprocessing.get_context()
+        result_queue = context.Queue()
+        task_queues = [context.Queue() for _ in range(self.workers)]
+        processes = [
+            context.Process(target=_crawl_worker, args=(self, task_queue, result_queue), daemon=True)
+            for task_queue in task_queues
+        ]
+        for process in processes:
+            process.start()
+        
+        window = self.workers * WORKER_WINDOW
+        next_seq = 0
+        next_to_print = 0
+        outstanding = 0
+        finished = {}  # seq -> (url, markdown), buffered until earlier pages are printed
+        
+        try:
+            while True:
+                # Keep every worker busy, within the page budget
+                while outstanding < window and (
+                    not self.max_pages or self.processed + outstanding < self.max_pages
+                ):
+                    entry = self.frontier.pop()
+                    if entry is None:
+                        break
+                    url, depth = entry
+                    task_queues[self._shard(url)].put((next_seq, url, depth))
+                    next_seq += 1
+                    outstanding += 1
+                
+                if outstanding == 0:
+                    break
                 
-                # Print the markdown to console
-                print("\n" + "=" * 80)
-                print(f"MARKDOWN FOR URL: {url}")
-                print("=" * 80)
-                print(markdown)
-                print("=" * 80 + "\n")
+                seq, url, depth, markdown, links, fingerprint, change = self._next_result(result_queue, processes)
+                outstanding -= 1
+                if not self._record_result(url, depth, markdown, links, fingerprint, change):
+                    markdown = None
                 
-                # If this is the seed URL, queue up to max_links additional links
-                if is_seed and self.max_links > 0:
-                    for link in links:
-                        if link_count >= self.max_links:
-                            break
-                            
-                        if link not in self.visited_urls:
-                            self.queue.append((link, False))  # Not a seed URL
-                            link_count += 1
-        
-        print(f"Crawling complete. Processed {len(self.visited_urls)} URLs.")
+                # Print results in dispatch order
+                finished[seq] = (url, markdown)
+                next_to_print = self._print_in_order(finished, next_to_print)
+        finally:
+            for task_queue in task_queues:
+                task_queue.put(None)
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        
+        self._print_summary()
+    
+    def _next_result(self, result_queue, processes: list) -> tuple:
+        """Wait for the next result from the workers; raises WorkerDied if one of them exits first."""
+        while True:
+            try:
+                return result_queue.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                pass
+            
+            # Workers only exit when told to, so one that has exited died with pages assigned to it
+            for number, process in enumerate(processes):
+                if not process.is_alive():
+                    raise WorkerDied(f"Crawl worker {number} exited with status {process.exitcode}")
+    
+    async def _run_worker(self, task_queue, result_queue) -> None:
+        """Fetch and convert the URLs sent to this worker, politely per host."""
+        fetcher = self._new_fetcher()
+        loop = asyncio.get_running_loop()
+        pending = set()
+        
+        async def work(seq: int, url: str, depth: int) -> None:
+            markdown, links, fingerprint, change = await self._process_url(fetcher, url)
+            result_queue.put((seq, url, depth, markdown, links, fingerprint, change))
+        
+        try:
+            while True:
+                item = await loop.run_in_executor(None, task_queue.get)
+                if item is None:
+                    break
+                task = asyncio.ensure_future(work(*item))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            
+            await asyncio.gather(*pending)
+        finally:
+            await close_session()
+
+
+def _crawl_worker(crawler: MarkdownCrawler, task_queue, result_queue) -> None:
+    """Worker process entry point."""
+    asyncio.run(crawler._run_worker(task_queue, result_queue))
 
 
 def main():
     """Main entry point for the crawler."""
     parser = argparse.ArgumentParser(description='Convert web pages to markdown and print to console.')
     parser.add_argument('url', help='The seed URL to start crawling from')
-    parser.add_argument('--max-links', type=int, default=0, help='Maximum number of additional links to process (default: 0)')
+    parser.add_argument('--max-links', type=int, default=0, help='Maximum number of links to queue from each page (default: 0)')
     parser.add_argument('--timeout', type=int, default=10, help='Request timeout in seconds')
+    parser.add_argument('--max-depth', type=int, default=1, help='Follow links from pages up to this depth; the seed is depth 0 (default: 1)')
+    parser.add_argument('--max-pages', type=int, default=0, help='Maximum number of pages to process, 0 means no limit (default: 0)')
+    parser.add_argument('--state', help='SQLite file for the crawl frontier; rerun with the same file to resume an interrupted crawl')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes; hosts are sharded across workers (default: 1)')
+    parser.add_argument('--near-duplicate-distance', type=int, default=config.NEAR_DUPLICATE_DISTANCE, help='Skip pages whose content fingerprint differs from a crawled page in at most this many of 64 bits; -1 keeps them (default: %(default)s)')
+    parser.add_argument('--store', help='Page store directory: downloads are kept there and recently stored pages are converted without fetching (default: SCRAPER_PAGE_STORE)')
+    parser.add_argument('--store-max-age', type=float, help=f'Seconds a stored page is used instead of fetching; older ones are revalidated with the server, -1 re-converts stored pages of any age offline (default: {config.PAGE_STORE_MAX_AGE}, 0 with --recrawl)')
+    parser.add_argument('--recrawl', action='store_true', help='Revisit every page of the crawl in --state, asking the server whether each changed, and print only new and changed pages followed by a change report; needs the page store of that crawl')
+    parser.add_argument('--bloom-error-rate', type=float, default=config.FRONTIER_BLOOM_ERROR_RATE, help='Remember seen URLs in a Bloom filter that skips about this share of new URLs, in under 10 bits per URL at 0.01; 0 keeps 64-bit fingerprints (default: %(default)s)')
+    parser.add_argument('--expected-urls', type=int, default=config.FRONTIER_EXPECTED_URLS, help='URLs the Bloom filter is sized for; past this it skips more (default: %(default)s)')
+    parser.add_argument('--main-content-only', action=argparse.BooleanOptionalAction, default=config.MAIN_CONTENT_ONLY, help='Convert only the main content of each page, leaving out navigation, banners, sidebars and link lists (default: SCRAPER_MAIN_CONTENT_ONLY, off)')
+    parser.add_argument('--parser', choices=('auto',) + PARSERS, default=config.HTML_PARSER, help='HTML parser backend; auto uses lxml when installed (default: %(default)s)')
     
     args = parser.parse_args()
+    if args.recrawl and not args.state:
+        parser.error('--recrawl needs the --state file of an earlier crawl')
+    if not 0 <= args.bloom_error_rate < 1:
+        parser.error('--bloom-error-rate must be at least 0 and below 1')
+    if args.recrawl and not (args.store or config.PAGE_STORE_PATH):
+        parser.error('--recrawl needs a page store: pass --store or set SCRAPER_PAGE_STORE')
     
     # Create crawler and start crawling
     crawler = MarkdownCrawler(
         seed_url=args.url,
         max_links=args.max_links,
-        timeout=args.timeout
+        timeout=args.timeout,
+        max_depth=args.max_depth,
+        max_pages=args.max_pages,
+        state_path=args.state,
+        workers=args.workers,
+        parser=args.parser,
+        near_duplicate_distance=args.near_duplicate_distance,
+        store_path=args.store,
+        store_max_age=args.store_max_age,
+        recrawl=args.recrawl,
+        bloom_error_rate=args.bloom_error_rate,
+        expected_urls=args.expected_urls,
+        main_content_only=args.main_content_only
     )
     
     print(f"Starting crawler with seed URL: {args.url}")
     print(f"Maximum additional links: {args.max_links}")
     
-    crawler.crawl()
+    try:
+        crawler.crawl()
+    except WorkerDied as e:
+        # Pages in flight stay in the state file and are retried when the crawl is resumed
+        parser.exit(1, f"Crawl failed: {e}\n")
 
 
 if __name__ == "__main__":
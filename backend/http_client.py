@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+
+import config
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# One pooled session per process (and event loop), shared by every fetch path
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _timing_trace() -> aiohttp.TraceConfig:
+    """Record DNS lookups and new connections (including TLS) in the stage timings."""
+    trace = aiohttp.TraceConfig()
+
+    async def on_dns_start(session, context, params):
+        context.dns_start = time.perf_counter()
+
+    async def on_dns_end(session, context, params):
+        STAGE_SECONDS.observe(time.perf_counter() - context.dns_start, stage='dns')
+
+    async def on_connect_start(session, context, params):
+        context.connect_start = time.perf_counter()
+
+    async def on_connect_end(session, context, params):
+        STAGE_SECONDS.observe(time.perf_counter() - context.connect_start, stage='connect')
+
+    trace.on_dns_resolvehost_start.append(on_dns_start)
+    trace.on_dns_resolvehost_end.append(on_dns_end)
+    trace.on_connection_create_start.append(on_connect_start)
+    trace.on_connection_create_end.append(on_connect_end)
+    return trace
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the process-wide pooled HTTP session, creating it on first use.
+
+    The connector keeps connections alive between requests, caps connections
+    in total and per host, caches DNS results and transparently decompresses
+    gzip and deflate responses.
+    """
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=config.HTTP_MAX_CONNECTIONS,
+            limit_per_host=config.HTTP_MAX_CONNECTIONS_PER_HOST,
+            use_dns_cache=True,
+            ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(connector=connector, auto_decompress=True, trace_configs=[_timing_trace()])
+        _session_loop = loop
+        logger.info(
+            f"Created HTTP session (max {config.HTTP_MAX_CONNECTIONS} connections, "
+            f"{config.HTTP_MAX_CONNECTIONS_PER_HOST} per host)"
+        )
+
+    return _session
+
+
+async def close_session() -> None:
+    """Close the shared session and its pooled connections."""
+    global _session, _session_loop
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
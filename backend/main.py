@@ -1,32 +1,101 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
-import requests
-from bs4 import BeautifulSoup
-from typing import Optional, List, Dict
+from pydantic import BaseModel, Field, HttpUrl
+import aiohttp
+from typing import AsyncIterator, Optional, List, Dict
+import atexit
 import logging
 import json
+import queue
 import sys
-from fastapi.responses import JSONResponse
+from logging.handlers import QueueHandler, QueueListener
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
+import asyncio
 import time
 import urllib.parse
-from collections import deque
+from contextlib import asynccontextmanager
+
+import config
+from admission import AdmissionController, Overloaded
+from cache import AsyncTTLCache
+from deadline import Deadline, DeadlineExceeded, LatencyEstimate
+from document import parse_html, resolve_parser, to_markdown
+from execution import CpuExecutor
+from fetcher import UNCHANGED, AsyncFetcher, FetchedPage, UnsupportedContentType
+from fingerprint import FingerprintIndex, simhash
+from http_client import close_session
+from metrics import ERRORS, PAGES_SKIPPED, REQUEST_SECONDS, STAGE_SECONDS, error_type, format_metric, render_metrics
+from page_store import call_store
+from responses import accepts_gzip, encode_json, parse_fields, select_fields
+from urls import LinkCandidate, canonicalize_url, rank_links
 
 # Configure logging with more detailed format
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler(sys.stdout)  # Ensure logs go to stdout
-    ]
-)
+log_handlers = [
+    logging.FileHandler('app.log'),
+    logging.StreamHandler(sys.stdout)  # Ensure logs go to stdout
+]
+for handler in log_handlers:
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+# Records are queued and written by a background thread, so file and console
+# I/O never blocks the event loop
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+queue_handler = QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter('%(message)s'))  # The listener's handlers add the full format
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Bounded pool for HTML parsing and markdown conversion
+cpu_executor = CpuExecutor(kind=config.CPU_POOL_KIND, max_workers=config.CPU_POOL_SIZE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_session()
+    cpu_executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+# Scrapes run at once by this worker, with a bounded queue; the rest are refused with 503
+admission = AdmissionController(
+    max_active=config.MAX_ACTIVE_SCRAPES,
+    max_queued=config.MAX_QUEUED_SCRAPES,
+    queue_timeout=config.SCRAPE_QUEUE_TIMEOUT
+)
+
+class AdmissionMiddleware:
+    """Admit scrape requests through the admission controller, holding the slot until the last byte is sent."""
+    
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+    
+    async def __call__(self, scope, receive, send):
+        # Metrics and cache stats stay available under overload
+        if scope["type"] != "http" or not scope["path"].startswith("/scrape"):
+            await self.app(scope, receive, send)
+            return
+        
+        try:
+            async with self.controller.admit():
+                await self.app(scope, receive, send)
+        except Overloaded as e:
+            logger.warning(f"🚦 Refusing {scope['path']}: {e}")
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": str(e)},
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+
+# Added first so it runs inside CORS and refusals get CORS headers too
+app.add_middleware(AdmissionMiddleware, controller=admission)
 
 # CORS configuration with error handling
 origins = [
@@ -65,14 +134,58 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(ErrorHandlerMiddleware)
 
+class MetricsMiddleware:
+    """Record API latency up to the last byte sent, so streamed responses are timed in full."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Label by route template, not the raw path, to keep the series count bounded
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                path=route.path if route is not None else "unmatched",
+                status=status
+            )
+
+app.add_middleware(MetricsMiddleware)
+
 class WebsiteRequest(BaseModel):
     url: HttpUrl
 
+class ScrapeRequest(WebsiteRequest):
+    fields: Optional[str] = None  # Comma-separated response fields, e.g. "markdown,related_pages.url"
+    deadline_ms: Optional[int] = Field(None, ge=1, le=config.DEADLINE_MAX_MS)  # Latency budget for the whole request
+
 class RelatedPage(BaseModel):
     url: str
     title: str
     markdown: str
 
+class RelatedPageStatus(BaseModel):
+    url: str
+    # "ok", "failed" (fetch error or not HTML), "duplicate", "timed_out" (cut off by the
+    # deadline) or "skipped" (not started, as it could not finish within the deadline)
+    status: str
+
 class ScrapingResponse(BaseModel):
     url: str
     title: str
@@ -80,226 +193,736 @@ class ScrapingResponse(BaseModel):
     html: str
     markdown: str  # Added field for markdown content
     related_pages: List[RelatedPage] = []  # Added field for related pages
+    related_status: List[RelatedPageStatus] = []  # Every related page tried or skipped, in link order
+    partial: bool = False  # The deadline cut the related pages short
+
+class BatchRequest(BaseModel):
+    urls: List[HttpUrl]
+    max_related_pages: int = Field(10, ge=0, le=50)
+    stream: bool = False
+
+class BatchResult(BaseModel):
+    url: str
+    error: Optional[str] = None
+    result: Optional[ScrapingResponse] = None
+
+class BatchScrapingResponse(BaseModel):
+    results: List[BatchResult]
+    unique_pages: int
 
 class MarkdownConverter:
     """A utility to convert HTML to Markdown and find related pages."""
     
-    def __init__(self, max_related_pages: int = 10):
+    # How long loading a related page takes, shared by every converter to plan within deadlines
+    page_seconds = LatencyEstimate()
+    
+    def __init__(
+        self,
+        max_related_pages: int = 10,
+        max_concurrency: int = config.FETCH_MAX_CONCURRENCY,
+        per_host_concurrency: int = config.FETCH_PER_HOST_CONCURRENCY,
+        executor: Optional[CpuExecutor] = None,
+        page_cache: Optional[AsyncTTLCache] = None,
+        fetcher: Optional[AsyncFetcher] = None,
+        frontier: Optional[Dict[str, asyncio.Future]] = None,
+        parser: str = config.HTML_PARSER,
+        near_duplicate_distance: int = config.NEAR_DUPLICATE_DISTANCE,
+        main_content_only: bool = config.MAIN_CONTENT_ONLY
+    ):
         self.max_related_pages = max_related_pages
+        self.max_concurrency = max_concurrency  # Related pages fetched at the same time
+        self.per_host_concurrency = per_host_concurrency  # Politeness limit for a single host
         self.user_agent = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+        self.parser = parser  # HTML parser backend: 'auto', 'html.parser' or 'lxml'
+        self.executor = executor  # Pool for parsing and conversion; None runs them inline
+        self.page_cache = page_cache  # Shared cache of related-page markdown
+        self.fetcher = fetcher  # Shared fetcher; a private one is created per process() when None
+        self.frontier = frontier  # Page loads shared across the seeds of a batch, by canonical URL
+        self.near_duplicate_distance = near_duplicate_distance  # Max differing fingerprint bits; -1 keeps duplicates
+        self.main_content_only = main_content_only  # Prune page chrome before conversion
         self.visited_urls = set()
+        self.fingerprints = FingerprintIndex(near_duplicate_distance)  # Content of the seed and collected pages
+        self.related_status: Dict[int, Dict] = {}  # Link index -> outcome of the related pages tried or skipped
+    
+    def __getstate__(self) -> Dict:
+        # Methods sent to a process pool pickle the converter; pools, caches and tasks stay behind
+        state = self.__dict__.copy()
+        state['executor'] = None
+        state['page_cache'] = None
+        state['fetcher'] = None
+        state['frontier'] = None
+        state['fingerprints'] = None
+        return state
     
     def _clean_url(self, url: str) -> str:
-        """Remove tracking parameters from URL."""
-        # Simple query cleaning
-        if '?' in url:
-            base_url = url.split('?')[0]
-            return base_url
-        return url
+        """Remove tracking parameters and fragments and put the URL in canonical form."""
+        return canonicalize_url(url)
     
     def _normalize_url(self, base_url: str, href: str) -> str:
         """Normalize relative URLs to absolute URLs."""
         if not href or href.startswith('#') or href.startswith('javascript:'):
             return None
             
-        # Convert relative URLs to absolute
-        abs_url = urllib.parse.urljoin(base_url, href)
-        
-        # Only keep https links
-        if not abs_url.startswith(('https://', 'http://')):
-            return None
+        try:
+            # Convert relative URLs to absolute
+            abs_url = urllib.parse.urljoin(base_url, href)
             
-        return self._clean_url(abs_url)
+            # Only keep https links
+            if not abs_url.startswith(('https://', 'http://')):
+                return None
+                
+            return self._clean_url(abs_url)
+        except ValueError:
+            # Malformed links, such as a port that is not a number, are skipped
+            return None
     
-    def _extract_links(self, soup: BeautifulSoup, base_url: str) -> list:
-        """Extract and normalize links from HTML."""
-        links = []
+    def _extract_links(self, document, base_url: str) -> list:
+        """Extract and normalize links from HTML, most promising first."""
+        candidates = []
         
-        for anchor in soup.find_all('a', href=True):
-            href = anchor.get('href', '')
+        for href, text, region in document.anchors():
             normalized_url = self._normalize_url(base_url, href)
             
             if normalized_url and normalized_url not in self.visited_urls:
-                links.append(normalized_url)
-        
-        # Remove duplicates while preserving order
-        unique_links = []
-        seen = set()
-        for link in links:
-            if link not in seen:
-                seen.add(link)
-                unique_links.append(link)
+                candidates.append(LinkCandidate(normalized_url, text, region))
         
-        return unique_links
+        # Rank by site, position, anchor text and depth, so the page budget goes to content links
+        return rank_links(candidates, base_url)
     
-    def _clean_html(self, soup: BeautifulSoup) -> BeautifulSoup:
+    def _clean_html(self, document):
         """Clean HTML for better markdown conversion."""
-        # Remove unnecessary elements
-        for tag in ['script', 'style', 'iframe', 'noscript']:
-            for element in soup.find_all(tag):
-                if element:
-                    element.decompose()
+        # Remove unnecessary elements; they are skipped while converting
+        document.remove_tags(['script', 'style', 'iframe', 'noscript'])
+        if self.main_content_only:
+            document.prune_boilerplate()
         
-        return soup
+        return document
+    
+    def _convert_document(self, document, url: str) -> str:
+        """Convert a parsed page to clean Markdown."""
+        # Clean HTML before conversion
+        clean_document = self._clean_html(document)
+        
+        return to_markdown(clean_document, url)
     
     def _convert_to_markdown(self, html: str, url: str) -> str:
         """Convert HTML to clean Markdown."""
-        # Import html2text here to avoid circular imports
-        import html2text
+        return self._convert_document(parse_html(html, self.parser), url)
+    
+    def _analyze_page(self, html: str, url: str) -> Dict:
+        """Parse a page once and extract its metadata, links and markdown, timing each stage."""
+        started = time.perf_counter()
+        document = parse_html(html, self.parser)
+        parsed = time.perf_counter()
         
-        soup = BeautifulSoup(html, 'html.parser')
+        # Metadata and links are read before cleaning removes any elements
+        title = document.title()
+        description = document.description()
+        links = self._extract_links(document, url)
+        extracted = time.perf_counter()
         
-        # Clean HTML before conversion
-        clean_soup = self._clean_html(soup)
+        markdown = self._convert_document(document, url)
+        converted = time.perf_counter()
         
-        # Configure HTML2Text
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = False
-        h.body_width = 0  # Don't wrap text
-        h.unicode_snob = True  # Use Unicode instead of ASCII
+        fingerprint = simhash(markdown) if self.near_duplicate_distance >= 0 else None
+        fingerprinted = time.perf_counter()
         
-        # Convert HTML to markdown
-        markdown = h.handle(str(clean_soup))
+        return {
+            "title": title,
+            "description": description,
+            "links": links,
+            "markdown": markdown,
+            "fingerprint": fingerprint,
+            # Returned rather than recorded here, since this may run in a worker process
+            "timings": {
+                "parse": parsed - started,
+                "links": extracted - parsed,
+                "convert": converted - extracted,
+                "fingerprint": fingerprinted - converted
+            }
+        }
+    
+    async def _run_cpu(self, func, *args):
+        """Run CPU-heavy work on the executor, or inline when none is configured."""
+        if self.executor is None:
+            return func(*args)
+        return await self.executor.run(func, *args)
+    
+    async def _analyze(self, html: str, url: str) -> Dict:
+        """Analyze a page on the executor and record its stage timings."""
+        analysis = await self._run_cpu(self._analyze_page, html, url)
+        for stage, seconds in analysis.pop("timings").items():
+            STAGE_SECONDS.observe(seconds, stage=stage)
+        return analysis
+    
+    def _conversion_variant(self) -> str:
+        """Name the settings that shape an analysis, so stored analyses are only reused under the same ones."""
+        fingerprinted = self.near_duplicate_distance >= 0
+        variant = f"{type(self).__name__}:{resolve_parser(self.parser)}:{'simhash' if fingerprinted else 'plain'}"
+        return variant + ':main' if self.main_content_only else variant
+    
+    async def _load_url(self, fetcher: AsyncFetcher, url: str) -> tuple:
+        """Fetch a URL and analyze its HTML.
         
-        # Add source URL as HTML comment at the top
-        markdown = f"<!-- {url} -->\n{markdown}"
+        Pages fetched over the network are timed into page_seconds; pages
+        read from the page store would make loading look almost free.
+        """
+        started = time.monotonic()
+        page = await fetcher.fetch_page(url)
+        if not page or not page.text:
+            return None, None
         
-        return markdown
+        result = await self._analyze_fetched(fetcher, url, page)
+        if not page.stored:
+            self.page_seconds.observe(time.monotonic() - started)
+        return result
     
-    def _fetch_url(self, url: str) -> tuple:
-        """Fetch a URL and extract HTML and links."""
-        logger.info(f"Fetching related page: {url}")
+    async def _analyze_fetched(self, fetcher: AsyncFetcher, url: str, page: FetchedPage) -> tuple:
+        """Analyze a fetched page, returning (html, analysis).
         
-        headers = {
-            'User-Agent': self.user_agent,
-            'Accept': 'text/html,application/xhtml+xml,application/xml',
-        }
+        With a page store, analyses are stored too, and a page the server
+        reports unchanged (304 or the same bytes) reuses its stored analysis
+        instead of being parsed and converted again.
+        """
+        store = fetcher.page_store()
+        if store is None:
+            return page.text, await self._analyze(page.text, url)
+        
+        variant = self._conversion_variant()
+        if page.change == UNCHANGED:
+            analysis = await call_store(store.load_conversion, url, page.digest, variant)
+            if analysis is not None:
+                logger.info(f"Reusing the stored conversion of unchanged {url}")
+                PAGES_SKIPPED.inc(reason='unchanged')
+                return page.text, analysis
+        
+        analysis = await self._analyze(page.text, url)
+        await call_store(store.save_conversion, url, page.digest, variant, analysis)
+        
+        return page.text, analysis
+    
+    async def _fetch_url(self, fetcher: AsyncFetcher, url: str) -> tuple:
+        """Fetch and analyze a URL, at most once per batch when a frontier is shared."""
+        # Make sure URL is valid
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        
+        if self.frontier is None:
+            return await self._load_url(fetcher, url)
+        
+        key = canonicalize_url(url)
+        if key not in self.frontier:
+            self.frontier[key] = asyncio.ensure_future(self._load_url(fetcher, url))
         
         try:
-            # Make sure URL is valid
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-                
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            # Simple check for HTML content
-            content_type = response.headers.get('Content-Type', '')
-            if not content_type.startswith('text/html'):
-                logger.info(f"Skipping non-HTML content: {url}")
-                return None, None, []
-            
-            logger.info(f"Successfully fetched related page - Status: {response.status_code}")
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            links = self._extract_links(soup, url)
-            
-            # Extract title
-            title = soup.title.string if soup.title else "No Title"
-            
-            return response.text, title, links
-            
-        except Exception as e:
-            logger.warning(f"Error fetching related page {url}: {e}")
-            return None, None, []
-    
-    def process(self, html: str, seed_url: str) -> Dict:
-        """Process HTML from seed URL and collect related pages."""
-        self.visited_urls = set([seed_url])
-        related_pages = []
-        
-        # First, convert the seed page to markdown
-        seed_markdown = self._convert_to_markdown(html, seed_url)
-        seed_soup = BeautifulSoup(html, 'html.parser')
-        
-        # Extract links from the seed page
-        links = self._extract_links(seed_soup, seed_url)
-        
-        # Process up to max_related_pages related pages
-        link_count = 0
-        for link in links:
-            if link_count >= self.max_related_pages:
-                break
-                
-            # Add polite delay to avoid overloading the server
-            time.sleep(1)
-            
-            related_html, related_title, _ = self._fetch_url(link)
-            if related_html:
-                related_markdown = self._convert_to_markdown(related_html, link)
-                related_pages.append({
-                    "url": link,
-                    "title": related_title,
-                    "markdown": related_markdown
-                })
-                link_count += 1
-                self.visited_urls.add(link)
+            return await asyncio.shield(self.frontier[key])
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            # The page was loaded as a seed of the batch and failed there
+            return None, None
+    
+    async def _load_related_page(self, fetcher: AsyncFetcher, url: str) -> Optional[Dict]:
+        """Fetch a related page and convert it to markdown."""
+        _, analysis = await self._fetch_url(fetcher, url)
+        if analysis is None:
+            return None
         
         return {
-            "markdown": seed_markdown,
-            "related_pages": related_pages
+            "url": url,
+            "title": analysis["title"] or "No Title",
+            "markdown": analysis["markdown"],
+            "fingerprint": analysis["fingerprint"]  # Removed again before the page is returned
         }
-
-@app.post("/scrape", response_model=ScrapingResponse)
-async def scrape_website(request: WebsiteRequest):
-    logger.info("="*50)
-    logger.info(f"🌐 New scraping request received")
-    logger.info(f"📍 URL to scrape: {request.url}")
     
-    try:
-        # Add headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+    async def _fetch_related_page(self, fetcher: AsyncFetcher, url: str) -> Optional[Dict]:
+        """Return a related page from the page cache, loading it on a miss."""
+        if self.page_cache is None:
+            return await self._load_related_page(fetcher, url)
         
-        logger.info(f"📤 Making request with headers: {json.dumps(headers)}")
-        
-        # Make the request
-        response = requests.get(str(request.url), headers=headers, timeout=10)
-        response.raise_for_status()
+        page = await self.page_cache.get_or_load(
+            canonicalize_url(url), lambda: self._load_related_page(fetcher, url)
+        )
+        return dict(page, url=url) if page else None
+    
+    async def analyze_seed(self, html: str, seed_url: str) -> Dict:
+        """Analyze the seed page: metadata, links and markdown from a single parse."""
+        self.visited_urls = set([seed_url, canonicalize_url(seed_url)])
+        seed = await self._analyze(html, seed_url)
+        self._index_seed(seed_url, seed)
+        return seed
+    
+    def _index_seed(self, seed_url: str, seed: Dict) -> None:
+        """Start a new near-duplicate index holding just the seed page."""
+        self.fingerprints = FingerprintIndex(self.near_duplicate_distance)
+        if seed.get("fingerprint") is not None:
+            self.fingerprints.add(seed["fingerprint"], seed_url)
+    
+    def _has_time_for_page(self, deadline: Optional[Deadline], probe: bool = False) -> bool:
+        """Whether a related page started now is expected to load before the deadline.
         
-        logger.info(f"📥 Response received - Status: {response.status_code}")
-        logger.info(f"📦 Response size: {len(response.text)} bytes")
+        A probe, the first page of a request, only needs some time left: the
+        estimate learns from pages that load, so without probes one slow spell
+        would keep every later request from loading any page at all.
+        """
+        if deadline is None:
+            return True
+        expected = 0.0 if probe else self.page_seconds.value or 0.0
+        return deadline.remaining() - config.DEADLINE_RESERVE_MS / 1000 > expected
+    
+    def _record_status(self, index: int, url: str, status: str) -> None:
+        self.related_status[index] = {"url": url, "status": status}
+    
+    async def iter_related_pages(self, links: List[str], deadline: Optional[Deadline] = None) -> AsyncIterator[tuple]:
+        """Fetch related pages concurrently and yield (link index, page) as each finishes.
         
-        # Parse the HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
+        Failed links and near-duplicates of the seed or of pages already
+        collected are replaced by the next candidates until max_related_pages
+        pages have been collected. With a deadline, pages are only started
+        while they are expected to finish in time, apart from a first probe
+        page that keeps the estimate current, and those still loading
+        when it expires are cancelled; loads shared through the page cache
+        finish in the background for later requests. The outcome of every page
+        tried or skipped is kept in related_status.
+        """
+        candidates = enumerate(links)
+        pending = {}  # task -> (link index, link)
+        collected = 0
+        started = 0
+        timed_out = 0
+        self.related_status = {}
         
-        # Extract metadata
-        title = soup.title.string if soup.title else ""
-        description = soup.find('meta', {'name': 'description'})
-        description = description.get('content') if description else None
+        fetcher = self.fetcher or AsyncFetcher(
+            max_concurrency=self.max_concurrency,
+            per_host_concurrency=self.per_host_concurrency,
+            user_agent=self.user_agent
+        )
         
-        logger.info(f"📝 Extracted metadata:")
-        logger.info(f"   - Title: {title[:50]}...")
-        logger.info(f"   - Description: {description[:50] if description else 'None'}...")
+        def launch():
+            nonlocal started
+            # Keep in-flight plus collected pages within the budget
+            while len(pending) + collected < self.max_related_pages and self._has_time_for_page(deadline, probe=not started):
+                candidate = next(candidates, None)
+                if candidate is None:
+                    return
+                index, link = candidate
+                if link in self.visited_urls:
+                    PAGES_SKIPPED.inc(reason='visited')
+                    continue
+                task = asyncio.ensure_future(self._fetch_related_page(fetcher, link))
+                pending[task] = (index, link)
+                started += 1
         
-        # Process HTML to markdown and find related pages
-        logger.info(f"🔄 Converting HTML to markdown and processing related pages...")
-        markdown_converter = MarkdownConverter(max_related_pages=10)
-        markdown_result = markdown_converter.process(response.text, str(request.url))
+        start = time.perf_counter()
+        try:
+            launch()
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline.remaining() - config.DEADLINE_RESERVE_MS / 1000)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Out of time: give up on the pages still loading. Loads shared
+                    # through the page cache carry on and are timed when they finish
+                    for task, (index, link) in pending.items():
+                        task.cancel()
+                        self._record_status(index, link, "timed_out")
+                        PAGES_SKIPPED.inc(reason='deadline')
+                    timed_out += len(pending)
+                    pending.clear()
+                    break
+                
+                for task in done:
+                    index, link = pending.pop(task)
+                    page = task.result()
+                    if not page:
+                        self._record_status(index, link, "failed")
+                        continue
+                    self.visited_urls.add(page["url"])
+                    fingerprint = page.pop("fingerprint", None)
+                    if fingerprint is not None:
+                        duplicate = self.fingerprints.find(fingerprint)
+                        if duplicate:
+                            logger.info(f"Skipping {page['url']}: near-duplicate of {duplicate}")
+                            PAGES_SKIPPED.inc(reason='duplicate')
+                            self._record_status(index, link, "duplicate")
+                            continue
+                        self.fingerprints.add(fingerprint, page["url"])
+                    collected += 1
+                    self._record_status(index, link, "ok")
+                    yield index, page
+                launch()
+            
+            # Pages the budget still had room for, but the deadline did not
+            unfilled = self.max_related_pages - collected - timed_out
+            while deadline is not None and unfilled > 0:
+                candidate = next(candidates, None)
+                if candidate is None:
+                    break
+                index, link = candidate
+                if link in self.visited_urls:
+                    continue
+                self._record_status(index, link, "skipped")
+                PAGES_SKIPPED.inc(reason='deadline')
+                unfilled -= 1
+            
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="related_pages")
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def process(
+        self, html: str, seed_url: str, seed: Optional[Dict] = None, deadline: Optional[Deadline] = None
+    ) -> Dict:
+        """Process HTML from seed URL and collect related pages.
         
-        # Create related pages list
-        related_pages = [
-            RelatedPage(url=page["url"], title=page["title"], markdown=page["markdown"])
-            for page in markdown_result["related_pages"]
-        ]
+        An already computed seed analysis can be passed to skip re-analyzing the page.
+        With a deadline, related pages that cannot load in time are left out and
+        the result is marked partial.
+        """
+        if seed is None:
+            seed = await self.analyze_seed(html, seed_url)
+        else:
+            self.visited_urls = set([seed_url, canonicalize_url(seed_url)])
+            self._index_seed(seed_url, seed)
         
-        logger.info(f"✅ Successfully processed URL and {len(related_pages)} related pages")
+        # Related pages finish in any order; return them in document order
+        finished = [item async for item in self.iter_related_pages(seed["links"], deadline)]
+        related_pages = [page for _, page in sorted(finished, key=lambda item: item[0])]
+        related_status = [status for _, status in sorted(self.related_status.items())]
         
-        result = ScrapingResponse(
-            url=str(request.url),
-            title=title,
-            description=description,
-            html=response.text,
-            markdown=markdown_result["markdown"],
-            related_pages=related_pages
+        return {
+            "title": seed["title"] or "",
+            "description": seed["description"],
+            "markdown": seed["markdown"],
+            "related_pages": related_pages,
+            "related_status": related_status,
+            "partial": any(status["status"] in ("timed_out", "skipped") for status in related_status)
+        }
+
+def _response_size(result: Dict) -> int:
+    """Approximate the memory held by a cached scrape result."""
+    return len(result["html"]) + len(result["markdown"]) + sum(
+        len(page["markdown"]) for page in result["related_pages"]
+    )
+
+def _page_size(page: Dict) -> int:
+    return len(page["markdown"])
+
+# Caches for full scrape results and per-page markdown, keyed by canonical URL
+response_cache = AsyncTTLCache(
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=config.RESPONSE_CACHE_MAX_BYTES,
+    ttl=config.CACHE_TTL,
+    sizeof=_response_size
+)
+page_cache = AsyncTTLCache(
+    max_entries=config.PAGE_CACHE_MAX_ENTRIES,
+    max_bytes=config.PAGE_CACHE_MAX_BYTES,
+    ttl=config.CACHE_TTL,
+    sizeof=_page_size
+)
+
+# Add headers to mimic a browser request
+SEED_USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+async def _fetch_seed(url: str, fetcher: Optional[AsyncFetcher] = None) -> str:
+    """Fetch the seed page, raising on network and HTTP errors."""
+    logger.info(f"📤 Making request with headers: {json.dumps({'User-Agent': SEED_USER_AGENT})}")
+    
+    # Make the request
+    fetcher = fetcher or AsyncFetcher(user_agent=SEED_USER_AGENT)
+    html = await fetcher.fetch_text(url)
+    
+    logger.info(f"📥 Response received")
+    logger.info(f"📦 Response size: {len(html)} bytes")
+    
+    return html
+
+async def _fetch_seed_within(url: str, deadline: Deadline) -> str:
+    """Fetch the seed page, giving up when the deadline expires."""
+    try:
+        return await asyncio.wait_for(_fetch_seed(url), deadline.remaining())
+    except asyncio.TimeoutError:
+        if not deadline.expired():
+            raise  # The fetch's own timeout
+        raise DeadlineExceeded(f"The seed page did not load within the {deadline.budget_ms} ms deadline")
+
+async def _scrape_uncached(url: str, deadline: Optional[Deadline] = None) -> Dict:
+    """Fetch a seed URL, convert it to markdown and collect related pages."""
+    html = await (_fetch_seed(url) if deadline is None else _fetch_seed_within(url, deadline))
+    
+    # Process HTML to markdown and find related pages
+    logger.info(f"🔄 Converting HTML to markdown and processing related pages...")
+    markdown_converter = MarkdownConverter(max_related_pages=10, executor=cpu_executor, page_cache=page_cache)
+    markdown_result = await markdown_converter.process(html, url, deadline=deadline)
+    title = markdown_result["title"]
+    description = markdown_result["description"]
+    
+    logger.info(f"📝 Extracted metadata:")
+    logger.info(f"   - Title: {title[:50]}...")
+    logger.info(f"   - Description: {description[:50] if description else 'None'}...")
+    
+    logger.info(f"✅ Successfully processed URL and {len(markdown_result['related_pages'])} related pages")
+    
+    return {
+        "url": url,
+        "title": title,
+        "description": description,
+        "html": html,
+        "markdown": markdown_result["markdown"],
+        "related_pages": markdown_result["related_pages"],
+        "related_status": markdown_result["related_status"],
+        "partial": markdown_result["partial"]
+    }
+
+def _response_cache_key(url: str, max_related_pages: int) -> str:
+    return f"{max_related_pages}:{canonicalize_url(url)}"
+
+async def _scrape(url: str, deadline_ms: Optional[int] = None) -> Dict:
+    """Scrape a URL, sharing cached and in-flight results for the same canonical URL.
+    
+    A request with a deadline waits on a load already in flight for as long as
+    its deadline allows; otherwise it loads what it can in time, and its result
+    is cached only if it is complete. Such loads are not shared, as they may
+    be partial.
+    """
+    key = _response_cache_key(url, 10)
+    if deadline_ms is None:
+        result = await response_cache.get_or_load(key, lambda: _scrape_uncached(url))
+        return dict(result, url=url)
+    
+    deadline = Deadline(deadline_ms)
+    result = response_cache.get(key)
+    if result is None:
+        load = response_cache.loading(key)
+        if load is not None:
+            result = await _wait_within(load, deadline)
+        else:
+            result = await _scrape_uncached(url, deadline)
+            if not result["partial"]:
+                response_cache.put(key, result)
+    return dict(result, url=url)
+
+async def _wait_within(load: asyncio.Future, deadline: Deadline) -> Dict:
+    """Wait on another request's load of the same page, giving up when the deadline expires."""
+    try:
+        # Shielded, so giving up does not cancel the load for the request that started it
+        return await asyncio.wait_for(asyncio.shield(load), deadline.remaining())
+    except asyncio.TimeoutError:
+        if not deadline.expired():
+            raise  # The load's own timeout
+        raise DeadlineExceeded(f"The page was still loading for another request after the {deadline.budget_ms} ms deadline")
+
+def _requested_fields(spec: Optional[str]) -> Optional[Dict]:
+    """Parse a fields selection for a ScrapingResponse, rejecting unknown fields with a 400."""
+    try:
+        return parse_fields(spec, ScrapingResponse)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _json_response(request: Request, data) -> Response:
+    """Serialize result data off the event loop, gzipped when the client accepts it.
+    
+    Results are built by this service, so they skip pydantic re-validation and
+    FastAPI's generic encoder.
+    """
+    compress_level = config.GZIP_LEVEL if accepts_gzip(request.headers.get("accept-encoding", "")) else None
+    with STAGE_SECONDS.time(stage="serialize"):
+        body, compressed = await cpu_executor.run(encode_json, data, compress_level, config.GZIP_MIN_BYTES)
+    
+    headers = {"Vary": "Accept-Encoding"}
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _load_batch_seed(converter: MarkdownConverter, url: str) -> tuple:
+    """Fetch and analyze a batch seed; errors propagate to the seed's result.
+    
+    The seed is fetched once, accepting any markup as /scrape does. Only
+    text/html pages are related pages, though, so other markup loads as
+    (html, None) and other seeds pass it over.
+    """
+    page = await converter.fetcher.fetch_markup(url)
+    if not page.text or not page.content_type.startswith('text/html'):
+        return page.text, None
+    
+    analysis = await converter._analyze(page.text, url)
+    return page.text, analysis
+
+async def _scrape_batch_seed(
+    url: str,
+    fetcher: AsyncFetcher,
+    frontier: Dict[str, asyncio.Future],
+    max_related_pages: int
+) -> Dict:
+    """Scrape one seed of a batch, sharing page loads with every other seed."""
+    markdown_converter = MarkdownConverter(
+        max_related_pages=max_related_pages,
+        executor=cpu_executor,
+        page_cache=page_cache,
+        fetcher=fetcher,
+        frontier=frontier
+    )
+    
+    key = canonicalize_url(url)
+    if key not in frontier:
+        frontier[key] = asyncio.ensure_future(_load_batch_seed(markdown_converter, url))
+    html, seed = await asyncio.shield(frontier[key])
+    
+    if html is None:
+        # Loaded first as another seed's related page, which skips anything
+        # but text/html: fetch it as a plain /scrape call would
+        html = await _fetch_seed(url, fetcher)
+    
+    markdown_result = await markdown_converter.process(html, url, seed=seed)
+    
+    return {
+        "url": url,
+        "title": markdown_result["title"],
+        "description": markdown_result["description"],
+        "html": html,
+        "markdown": markdown_result["markdown"],
+        "related_pages": markdown_result["related_pages"],
+        "related_status": markdown_result["related_status"],
+        "partial": markdown_result["partial"]
+    }
+
+async def _scrape_in_batch(
+    url: str,
+    fetcher: AsyncFetcher,
+    frontier: Dict[str, asyncio.Future],
+    max_related_pages: int
+) -> Dict:
+    """Scrape a batch seed and report its outcome as a BatchResult-shaped dict."""
+    try:
+        result = await response_cache.get_or_load(
+            _response_cache_key(url, max_related_pages),
+            lambda: _scrape_batch_seed(url, fetcher, frontier, max_related_pages)
         )
+        return {"url": url, "result": dict(result, url=url)}
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"❌ Request error while scraping {url} in batch: {e}")
+        return {"url": url, "error": str(e)}
+    except Exception as e:
+        logger.error(f"❌ Unexpected error while scraping {url} in batch")
+        logger.error(f"Error type: {type(e).__name__}")
+        logger.error(f"Error details: {str(e)}")
+        ERRORS.inc(type=error_type(e))
+        return {"url": url, "error": "An unexpected error occurred"}
+
+def _start_batch(request: BatchRequest) -> tuple:
+    """Start scraping every seed of a batch against one shared fetcher and frontier."""
+    fetcher = AsyncFetcher(
+        max_concurrency=config.BATCH_MAX_CONCURRENCY,
+        per_host_concurrency=config.FETCH_PER_HOST_CONCURRENCY,
+        user_agent=SEED_USER_AGENT
+    )
+    frontier: Dict[str, asyncio.Future] = {}
+    
+    tasks = [
+        asyncio.ensure_future(_scrape_in_batch(str(url), fetcher, frontier, request.max_related_pages))
+        for url in request.urls
+    ]
+    return tasks, frontier
+
+async def _scrape_batch_stream(tasks: List[asyncio.Future], frontier: Dict) -> AsyncIterator[str]:
+    """Yield one NDJSON result line per seed as it finishes, then a summary."""
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield json.dumps({"type": "result", **await task}) + "\n"
+        
+        yield json.dumps({"type": "summary", "seeds": len(tasks), "unique_pages": len(frontier)}) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _scrape_stream(
+    url: str,
+    html: str,
+    markdown_converter: MarkdownConverter,
+    seed: Dict,
+    start_time: float
+) -> AsyncIterator[str]:
+    """Yield NDJSON events: the seed page, each related page as it finishes, then a summary."""
+    yield json.dumps({
+        "type": "seed",
+        "url": url,
+        "title": seed["title"] or "",
+        "description": seed["description"],
+        "html": html,
+        "markdown": seed["markdown"]
+    }) + "\n"
+    
+    # Drop the seed page before fanning out so it is not held while related pages load
+    links = seed["links"]
+    del seed, html
+    
+    related_count = 0
+    try:
+        async for _, page in markdown_converter.iter_related_pages(links):
+            related_count += 1
+            yield json.dumps({"type": "related_page", **page}) + "\n"
+    except Exception as e:
+        logger.error(f"❌ Error while streaming related pages for {url}: {e}")
+        yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+    
+    logger.info(f"✅ Streamed URL and {related_count} related pages")
+    
+    yield json.dumps({
+        "type": "summary",
+        "url": url,
+        "related_pages": related_count,
+        "elapsed_ms": round((time.monotonic() - start_time) * 1000)
+    }) + "\n"
+
+async def _start_stream(url: str) -> StreamingResponse:
+    """Fetch and analyze the seed page up front so its errors still produce an HTTP error status."""
+    try:
+        html = await _fetch_seed(url)
+    except UnsupportedContentType as e:
+        logger.error(f"❌ Not scraping {url}: {e}")
+        raise HTTPException(status_code=415, detail=str(e))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"❌ Request error while scraping {url}")
+        logger.error(f"Error details: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    start_time = time.monotonic()
+    markdown_converter = MarkdownConverter(max_related_pages=10, executor=cpu_executor, page_cache=page_cache)
+    try:
+        seed = await markdown_converter.analyze_seed(html, url)
+    except Exception as e:
+        logger.error(f"❌ Unexpected error while analyzing {url}")
+        logger.error(f"Error type: {type(e).__name__}")
+        logger.error(f"Error details: {str(e)}")
+        ERRORS.inc(type=error_type(e))
+        raise HTTPException(status_code=500, detail="An unexpected error occurred")
+    
+    return StreamingResponse(
+        _scrape_stream(url, html, markdown_converter, seed, start_time), media_type="application/x-ndjson"
+    )
+
+@app.post("/scrape", response_model=ScrapingResponse)
+async def scrape_website(request: ScrapeRequest, http_request: Request):
+    logger.info("="*50)
+    logger.info(f"🌐 New scraping request received")
+    logger.info(f"📍 URL to scrape: {request.url}")
+    
+    fields = _requested_fields(request.fields)
+    
+    try:
+        result = await _scrape(str(request.url), request.deadline_ms)
+        response = await _json_response(http_request, select_fields(result, fields))
         
         logger.info("="*50)
-        return result
+        return response
         
-    except requests.RequestException as e:
+    except DeadlineExceeded as e:
+        logger.error(f"⏱️ Deadline exceeded while scraping {request.url}: {e}")
+        logger.info("="*50)
+        raise HTTPException(status_code=504, detail=str(e))
+    except UnsupportedContentType as e:
+        logger.error(f"❌ Not scraping {request.url}: {e}")
+        logger.info("="*50)
+        raise HTTPException(status_code=415, detail=str(e))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"❌ Request error while scraping {request.url}")
         logger.error(f"Error details: {str(e)}")
         logger.info("="*50)
@@ -309,74 +932,43 @@ async def scrape_website(request: WebsiteRequest):
         logger.error(f"Error type: {type(e).__name__}")
         logger.error(f"Error details: {str(e)}")
         logger.info("="*50)
+        ERRORS.inc(type=error_type(e))
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
-@app.get("/scrape")
-async def scrape_website_get(url: str):
+@app.get("/scrape", response_model=ScrapingResponse)
+async def scrape_website_get(
+    url: str,
+    http_request: Request,
+    fields: Optional[str] = None,
+    deadline_ms: Optional[int] = Query(None, ge=1, le=config.DEADLINE_MAX_MS)
+):
     logger.info("="*50)
     logger.info(f"🌐 New GET scraping request received")
     logger.info(f"📍 URL to scrape: {url}")
     
+    fields = _requested_fields(fields)
+    
     try:
-        # Add headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        logger.info(f"📤 Making request with headers: {json.dumps(headers)}")
-        
         # Make sure URL is valid
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
-        # Make the request
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        logger.info(f"📥 Response received - Status: {response.status_code}")
-        logger.info(f"📦 Response size: {len(response.text)} bytes")
-        
-        # Parse the HTML for metadata
-        soup = BeautifulSoup(response.text, 'html.parser')
-        title = soup.title.string if soup.title else ""
-        description = soup.find('meta', {'name': 'description'})
-        description = description.get('content') if description else None
-        
-        logger.info(f"📝 Extracted metadata:")
-        logger.info(f"   - Title: {title[:50]}...")
-        logger.info(f"   - Description: {description[:50] if description else 'None'}...")
-        
-        # Process HTML to markdown and find related pages
-        logger.info(f"🔄 Converting HTML to markdown and processing related pages...")
-        markdown_converter = MarkdownConverter(max_related_pages=10)
-        markdown_result = markdown_converter.process(response.text, url)
-        
-        # Create related pages data
-        related_pages_data = [
-            {
-                "url": page["url"],
-                "title": page["title"],
-                "markdown": page["markdown"]
-            }
-            for page in markdown_result["related_pages"]
-        ]
-        
-        logger.info(f"✅ Successfully processed URL and {len(related_pages_data)} related pages")
-        
         # Create a full response with markdown and related pages
-        result = {
-            "url": url,
-            "title": title,
-            "description": description,
-            "html": response.text,
-            "markdown": markdown_result["markdown"],
-            "related_pages": related_pages_data
-        }
+        result = await _scrape(url, deadline_ms)
+        response = await _json_response(http_request, select_fields(result, fields))
         
         logger.info("="*50)
-        return result
+        return response
         
-    except requests.RequestException as e:
+    except DeadlineExceeded as e:
+        logger.error(f"⏱️ Deadline exceeded while scraping {url}: {e}")
+        logger.info("="*50)
+        raise HTTPException(status_code=504, detail=str(e))
+    except UnsupportedContentType as e:
+        logger.error(f"❌ Not scraping {url}: {e}")
+        logger.info("="*50)
+        raise HTTPException(status_code=415, detail=str(e))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"❌ Request error while scraping {url}")
         logger.error(f"Error details: {str(e)}")
         logger.info("="*50)
@@ -386,9 +978,93 @@ async def scrape_website_get(url: str):
         logger.error(f"Error type: {type(e).__name__}")
         logger.error(f"Error details: {str(e)}")
         logger.info("="*50)
+        ERRORS.inc(type=error_type(e))
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
+@app.post("/scrape/stream")
+async def scrape_website_stream(request: WebsiteRequest):
+    logger.info("="*50)
+    logger.info(f"🌐 New streaming scraping request received")
+    logger.info(f"📍 URL to scrape: {request.url}")
+    
+    return await _start_stream(str(request.url))
+
+@app.get("/scrape/stream")
+async def scrape_website_stream_get(url: str):
+    logger.info("="*50)
+    logger.info(f"🌐 New GET streaming scraping request received")
+    logger.info(f"📍 URL to scrape: {url}")
+    
+    # Make sure URL is valid
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    
+    return await _start_stream(url)
+
+@app.post("/scrape/batch", response_model=BatchScrapingResponse)
+async def scrape_website_batch(request: BatchRequest, http_request: Request):
+    logger.info("="*50)
+    logger.info(f"🌐 New batch scraping request received with {len(request.urls)} URLs")
+    
+    if len(request.urls) > config.BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {config.BATCH_MAX_URLS} URLs")
+    
+    tasks, frontier = _start_batch(request)
+    
+    if request.stream:
+        return StreamingResponse(_scrape_batch_stream(tasks, frontier), media_type="application/x-ndjson")
+    
+    results = await asyncio.gather(*tasks)
+    
+    logger.info(f"✅ Batch complete: {len(results)} seeds, {len(frontier)} unique pages fetched")
+    logger.info("="*50)
+    
+    return await _json_response(http_request, {
+        "results": [
+            {"url": result["url"], "error": result.get("error"), "result": result.get("result")}
+            for result in results
+        ],
+        "unique_pages": len(frontier)
+    })
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Report hit, miss and eviction counters for the scrape caches."""
+    return {
+        "responses": response_cache.stats(),
+        "pages": page_cache.stats()
+    }
+
+def _admission_metric_lines() -> List[str]:
+    """Expose this worker's admission state alongside the other metrics."""
+    return (
+        format_metric("scraper_active_scrapes", "gauge", "Scrapes running in this worker", [], {(): admission.active})
+        + format_metric("scraper_queued_scrapes", "gauge", "Scrapes waiting for a slot in this worker", [], {(): admission.queued})
+        + format_metric("scraper_rejected_scrapes_total", "counter", "Scrapes refused with 503", [], {(): admission.rejected})
+    )
+
+def _cache_metric_lines() -> List[str]:
+    """Expose the scrape cache counters alongside the other metrics."""
+    caches = {"responses": response_cache.stats(), "pages": page_cache.stats()}
+    lines = []
+    for stat, kind in (("entries", "gauge"), ("bytes", "gauge"), ("hits", "counter"),
+                       ("misses", "counter"), ("coalesced", "counter"), ("evictions", "counter")):
+        name = f"scraper_cache_{stat}_total" if kind == "counter" else f"scraper_cache_{stat}"
+        samples = {(cache,): stats[stat] for cache, stats in caches.items()}
+        lines.extend(format_metric(name, kind, f"Scrape cache {stat}", ["cache"], samples))
+    return lines
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request latency, per-stage timings, fetch counters and caches."""
+    return Response(
+        content=render_metrics(_cache_metric_lines() + _admission_metric_lines()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("🚀 Starting server...")
-    uvicorn.run(app, host="0.0.0.0", port=4000) 
\ No newline at end of file
+    # A single process, for development; serve.py runs several workers.
+    # On shutdown, new connections are refused and requests in flight get SHUTDOWN_TIMEOUT to finish
+    uvicorn.run(app, host=config.SERVER_HOST, port=config.SERVER_PORT, timeout_graceful_shutdown=config.SHUTDOWN_TIMEOUT)
@@ -0,0 +1,141 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond parsing up to slow scrapes
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_metric(name: str, kind: str, documentation: str, labelnames: Sequence[str],
+                  samples: Dict[Tuple[str, ...], float]) -> List[str]:
+    """Render one metric family in the Prometheus text exposition format."""
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+    for values, value in samples.items():
+        lines.append(f'{name}{_labels(labelnames, values)} {_number(value)}')
+    return lines
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()  # CPU pool threads record metrics too
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            samples = dict(self._values)
+        return format_metric(self.name, 'counter', self.documentation, self.labelnames, samples)
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts = self._values[key]
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for key, counts in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _labels(self.labelnames + ('le',), key + (_number(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_number(counts[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+REGISTRY: List = []
+
+
+def render_metrics(extra: Sequence[str] = ()) -> str:
+    """Render every registered metric, plus already formatted lines, as one exposition."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra)
+    return '\n'.join(lines) + '\n'
+
+
+def error_type(error: BaseException) -> str:
+    """A low-cardinality label for an error: the HTTP status for bad responses, else the class name."""
+    status = getattr(error, 'status', None)
+    if isinstance(status, int):
+        return f'http_{status}'
+    return type(error).__name__
+
+
+# Metrics shared by the fetcher, the HTTP client and the API
+STAGE_SECONDS = Histogram(
+    'scraper_stage_seconds',
+    'Time spent in each stage of scraping: politeness (waiting for a host), dns, connect, download, parse, links, convert, fingerprint, related_pages, serialize',
+    ['stage']
+)
+REQUEST_SECONDS = Histogram(
+    'scraper_http_request_seconds',
+    'API request latency until the last byte of the response',
+    ['method', 'path', 'status']
+)
+FETCHED_BYTES = Counter('scraper_fetched_bytes_total', 'Response body bytes downloaded')
+FETCHES = Counter('scraper_fetches_total', 'Page fetches by outcome', ['outcome'])
+PAGES_SKIPPED = Counter('scraper_pages_skipped_total', 'Pages skipped without conversion, by reason', ['reason'])
+ERRORS = Counter('scraper_errors_total', 'Errors by type', ['type'])
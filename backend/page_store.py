@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Iterator, NamedTuple, Optional
+
+import config
+from urls import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+# Errors a damaged or unwritable store can raise; callers treat them as a store miss
+STORE_ERRORS = (OSError, sqlite3.Error, zlib.error)
+
+# Let SQLite read the index through a memory map instead of read() calls
+INDEX_MMAP_BYTES = 256 * 1024 * 1024
+
+
+class StoredPage(NamedTuple):
+    url: str  # Canonical URL
+    digest: str  # SHA-256 of the raw body, hex
+    content_type: str
+    status: int
+    size: int  # Raw body bytes
+    fetched_at: float  # Unix time of the last download
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class PageStore:
+    """Raw page bodies on disk, compressed and addressed by content hash.
+
+    Bodies live in objects/<2 hex>/<sha256>, so identical pages are stored
+    once. An SQLite index maps canonical URLs to their body hash and fetch
+    metadata, and keeps each URL's latest conversion so unchanged pages need
+    not be converted again. Methods block; call them from a thread in async
+    code. The store may be shared by several processes.
+    """
+
+    def __init__(self, path: str, compress_level: int = config.PAGE_STORE_COMPRESS_LEVEL):
+        self.path = path
+        self.compress_level = compress_level
+        self._objects = os.path.join(path, 'objects')
+        os.makedirs(self._objects, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, 'index.sqlite'), timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(f'PRAGMA mmap_size={INDEX_MMAP_BYTES}')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                digest BLOB NOT NULL,
+                content_type TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT
+            ) WITHOUT ROWID
+        ''')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS conversions (
+                url TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                digest BLOB NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (url, variant)
+            ) WITHOUT ROWID
+        ''')
+        self._db.commit()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self._objects, digest[:2], digest)
+
+    @staticmethod
+    def _row(row: tuple) -> StoredPage:
+        url, digest, content_type, status, size, fetched_at, etag, last_modified = row
+        return StoredPage(url, digest.hex(), content_type, status, size, fetched_at, etag, last_modified)
+
+    def lookup(self, url: str) -> Optional[StoredPage]:
+        """Return the index entry for a URL, in any spelling, or None."""
+        with self._lock:
+            row = self._db.execute('SELECT * FROM pages WHERE url = ?', (canonicalize_url(url),)).fetchone()
+        return self._row(row) if row else None
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """Return the raw body with the given hash, or None if it is missing."""
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                return zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+
+    def load(self, url: str, max_age: float = -1) -> Optional[tuple]:
+        """Return (entry, raw body) for a URL stored less than max_age seconds ago.
+
+        A negative max_age accepts stored pages of any age.
+        """
+        page = self.lookup(url)
+        if page is None or (max_age >= 0 and time.time() - page.fetched_at > max_age):
+            return None
+
+        body = self.read(page.digest)
+        if body is None:
+            logger.warning(f"Page store entry for {url} has no body {page.digest}")
+            return None
+        return page, body
+
+    def save(
+        self,
+        url: str,
+        body: bytes,
+        content_type: str,
+        status: int = 200,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ) -> StoredPage:
+        """Store a downloaded body and point the URL at it."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            # Write to a temporary name first, so readers never see a partial file
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(zlib.compress(body, self.compress_level))
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+        page = StoredPage(canonicalize_url(url), digest, content_type, status, len(body), time.time(), etag, last_modified)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (page.url, bytes.fromhex(digest), *page[2:])
+            )
+            self._db.commit()
+        return page
+
+    def touch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Record that a stored page was revalidated (HTTP 304) just now, keeping known validators."""
+        with self._lock:
+            self._db.execute(
+                'UPDATE pages SET fetched_at = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) '
+                'WHERE url = ?',
+                (time.time(), etag, last_modified, canonicalize_url(url))
+            )
+            self._db.commit()
+
+    def save_conversion(self, url: str, digest: str, variant: str, data: dict) -> None:
+        """Keep a JSON-serializable conversion of the body with this hash.
+
+        variant names the conversion settings, so results of other settings are not reused.
+        """
+        blob = zlib.compress(json.dumps(data).encode('utf-8'), self.compress_level)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?)',
+                (canonicalize_url(url), variant, bytes.fromhex(digest), blob)
+            )
+            self._db.commit()
+
+    def load_conversion(self, url: str, digest: str, variant: str) -> Optional[dict]:
+        """Return the saved conversion of a URL if it was made from the body with this hash."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT digest, data FROM conversions WHERE url = ? AND variant = ?',
+                (canonicalize_url(url), variant)
+            ).fetchone()
+        if row is None or row[0] != bytes.fromhex(digest):
+            return None
+        return json.loads(zlib.decompress(row[1]))
+
+    def pages(self) -> Iterator[StoredPage]:
+        """Iterate over every index entry, in URL order."""
+        with self._lock:
+            rows = self._db.execute('SELECT * FROM pages ORDER BY url').fetchall()
+        for row in rows:
+            yield self._row(row)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+# The store configured with SCRAPER_PAGE_STORE, opened on first use
+_store: Optional[PageStore] = None
+
+
+def get_page_store() -> Optional[PageStore]:
+    """Return the process-wide page store, or None when none is configured."""
+    global _store
+
+    if _store is None and config.PAGE_STORE_PATH:
+        _store = PageStore(config.PAGE_STORE_PATH)
+        logger.info(f"Using page store at {config.PAGE_STORE_PATH} ({len(_store)} pages)")
+    return _store
+
+
+async def call_store(method, *args):
+    """Call a blocking store method in a thread; store failures are logged and return None."""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+    except STORE_ERRORS as e:
+        logger.warning(f"Page store error for {args[0]}: {e}")
+        return None
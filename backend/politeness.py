@@ -0,0 +1,265 @@
+import asyncio
+import email.utils
+import logging
+import time
+import urllib.parse
+import urllib.robotparser
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import aiohttp
+
+import config
+from http_client import get_session
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean the host wants us to slow down
+THROTTLE_STATUSES = (429, 503)
+
+# robots.txt files larger than this are cut off, as Google does at 500 KiB
+ROBOTS_MAX_BYTES = 500 * 1024
+# Hosts whose robots.txt could not be fetched are asked again after this many seconds
+ROBOTS_ERROR_TTL = 60.0
+
+# Idle host states are dropped once this many hosts are tracked
+MAX_TRACKED_HOSTS = 10_000
+
+
+class HostThrottled(aiohttp.ClientError):
+    """A host asked us to back off for longer than a request is willing to wait."""
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header, given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment is None or moment.tzinfo is None:
+        return None
+    return max(0.0, moment.timestamp() - time.time())
+
+
+@dataclass
+class HostState:
+    rate: float  # Requests per second currently allowed
+    ceiling: float  # Highest rate allowed, lowered by a robots.txt Crawl-delay
+    burst: float  # Bucket size: requests that may start back to back
+    tokens: float
+    updated: float
+    blocked_until: float = 0.0  # No request starts before this time (Retry-After or backoff)
+    throttled: int = 0  # Consecutive 429/503 responses
+    robots_expires: float = 0.0
+
+
+class PolitenessScheduler:
+    """Decide when each request may start, with a token bucket per host.
+
+    A host starts at initial_rate requests per second with room for a short
+    burst. Fast successful responses raise its rate step by step up to
+    max_rate; slow responses and errors lower it. 429 and 503 responses halve
+    the rate and block the host for the Retry-After time, or an exponential
+    backoff without one. A Crawl-delay or Request-rate in robots.txt caps the
+    rate and disables bursts. Hosts never wait on each other.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = config.POLITENESS_INITIAL_RATE,
+        max_rate: float = config.POLITENESS_MAX_RATE,
+        min_rate: float = config.POLITENESS_MIN_RATE,
+        burst: int = config.POLITENESS_BURST,
+        fast_response: float = config.POLITENESS_FAST_RESPONSE,
+        slow_response: float = config.POLITENESS_SLOW_RESPONSE,
+        max_backoff: float = config.POLITENESS_MAX_BACKOFF,
+        max_wait: float = config.POLITENESS_MAX_WAIT,
+        robots_ttl: float = config.ROBOTS_CACHE_TTL,
+        robots_timeout: float = config.ROBOTS_TIMEOUT,
+        user_agent: str = '*'
+    ):
+        self.initial_rate = initial_rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.fast_response = fast_response  # Responses faster than this speed a host up
+        self.slow_response = slow_response  # Responses slower than this slow it down
+        self.max_backoff = max_backoff  # Longest backoff without a Retry-After header
+        self.max_wait = max_wait  # Requests fail instead of waiting longer than this for a blocked host
+        self.robots_ttl = robots_ttl  # 0 skips robots.txt entirely
+        self.robots_timeout = robots_timeout
+        self.user_agent = user_agent  # Matched against robots.txt User-agent groups
+        self._hosts: Dict[str, HostState] = {}
+        self._robots_loading: Dict[str, asyncio.Future] = {}
+
+    async def acquire(self, url: str) -> None:
+        """Wait until a request to the URL's host may start.
+
+        Raises HostThrottled when the host is blocked for longer than max_wait.
+        """
+        parts = urllib.parse.urlsplit(url)
+        state = await self._host_state(parts)
+
+        now = time.monotonic()
+        if state.blocked_until - now > self.max_wait:
+            raise HostThrottled(f"{parts.netloc} asked to back off for {state.blocked_until - now:.0f}s")
+
+        # Take a token now, going into debt if there is none, so waiters start in arrival order
+        state.tokens = min(state.burst, state.tokens + (now - state.updated) * state.rate)
+        state.updated = now
+        state.tokens -= 1
+        ready_at = now + max(0.0, -state.tokens / state.rate)
+
+        waited = False
+        while True:
+            # A backoff set while waiting applies to requests already in line
+            wait = max(ready_at, state.blocked_until) - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited = True
+        if waited:
+            STAGE_SECONDS.observe(time.monotonic() - now, stage='politeness')
+
+    def record(self, url: str, status: Optional[int], elapsed: float, retry_after: Optional[str] = None) -> float:
+        """Adjust a host's rate from a response status (None for network errors) and its latency.
+
+        Returns how long the host is now blocked for, in seconds.
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        state = self._hosts.get(host)
+        if state is None:
+            return 0.0
+
+        now = time.monotonic()
+        if status in THROTTLE_STATUSES:
+            state.throttled += 1
+            delay = retry_after_seconds(retry_after)
+            if delay is None:
+                delay = min(self.max_backoff, 2.0 ** (state.throttled - 1))
+            state.blocked_until = max(state.blocked_until, now + delay)
+            state.rate = max(self.min_rate, state.rate / 2)
+            state.tokens = min(state.tokens, 0.0)
+            logger.warning(f"{host} answered {status}; backing off {delay:.1f}s at {state.rate:.2f} requests/s")
+        elif status is None or status >= 500 or elapsed > self.slow_response:
+            state.rate = max(self.min_rate, state.rate * 0.75)
+        elif status < 400:
+            state.throttled = 0
+            if elapsed <= self.fast_response:
+                # Additive increase: about one more request per second every few fast responses
+                state.rate = min(state.ceiling, state.rate + 0.25)
+
+        return max(0.0, state.blocked_until - now)
+
+    async def _host_state(self, parts: urllib.parse.SplitResult) -> HostState:
+        host = parts.netloc
+        state = self._hosts.get(host)
+        if state is not None and time.monotonic() < state.robots_expires:
+            return state
+
+        min_interval, robots_ttl = await self._robots_interval(parts)
+        now = time.monotonic()
+        state = self._hosts.get(host)  # Another request may have created it meanwhile
+        if state is None:
+            if len(self._hosts) >= MAX_TRACKED_HOSTS:
+                self._prune(now)
+            state = HostState(
+                rate=self.initial_rate, ceiling=self.max_rate, burst=self.burst,
+                tokens=self.burst, updated=now
+            )
+            self._hosts[host] = state
+
+        if min_interval:
+            state.ceiling = min(self.max_rate, 1 / min_interval)
+            state.burst = 1
+        else:
+            state.ceiling = self.max_rate
+            state.burst = self.burst
+        state.rate = min(state.rate, state.ceiling)
+        state.tokens = min(state.tokens, state.burst)
+        state.robots_expires = now + robots_ttl
+        return state
+
+    def _prune(self, now: float) -> None:
+        """Forget hosts that are neither blocked nor owed tokens."""
+        for host, state in list(self._hosts.items()):
+            if state.blocked_until <= now and state.tokens + (now - state.updated) * state.rate >= state.burst:
+                del self._hosts[host]
+
+    async def _robots_interval(self, parts: urllib.parse.SplitResult) -> tuple:
+        """Minimum seconds between requests asked for by the host's robots.txt, if any.
+
+        Returns (interval or None, seconds until robots.txt should be read again).
+        """
+        if self.robots_ttl <= 0:
+            return None, float('inf')
+
+        # Concurrent first requests to a host share one robots.txt download
+        origin = f"{parts.scheme}://{parts.netloc}"
+        loading = self._robots_loading.get(origin)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load_robots(origin))
+            self._robots_loading[origin] = loading
+            loading.add_done_callback(lambda _: self._robots_loading.pop(origin, None))
+        return await asyncio.shield(loading)
+
+    async def _load_robots(self, origin: str) -> tuple:
+        url = f"{origin}/robots.txt"
+        try:
+            session = get_session()
+            timeout = aiohttp.ClientTimeout(total=self.robots_timeout)
+            async with session.get(url, timeout=timeout, allow_redirects=True) as response:
+                if 400 <= response.status < 500:
+                    return None, self.robots_ttl  # No robots.txt: no rules
+                response.raise_for_status()
+                body = await response.content.read(ROBOTS_MAX_BYTES)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"Could not fetch {url}: {e}")
+            return None, min(self.robots_ttl, ROBOTS_ERROR_TTL)
+
+        parser = urllib.robotparser.RobotFileParser(url)
+        parser.parse(body.decode('utf-8', errors='replace').splitlines())
+
+        intervals = []
+        delay = parser.crawl_delay(self.user_agent)
+        if delay:
+            intervals.append(float(delay))
+        request_rate = parser.request_rate(self.user_agent)
+        if request_rate and request_rate.requests:
+            intervals.append(request_rate.seconds / request_rate.requests)
+        if intervals:
+            logger.info(f"{url} asks for {max(intervals):.2f}s between requests")
+            return max(intervals), self.robots_ttl
+        return None, self.robots_ttl
+
+
+# One scheduler per process (and event loop), so politeness holds across requests
+_scheduler: Optional[PolitenessScheduler] = None
+_scheduler_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_scheduler() -> PolitenessScheduler:
+    """Return the process-wide politeness scheduler, creating it on first use.
+
+    Each API worker process gets an equal share of the configured rates, so a
+    host sees the same total rate whatever the number of workers.
+    """
+    global _scheduler, _scheduler_loop
+
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler_loop is not loop:
+        share = max(config.SERVER_WORKERS, 1)
+        _scheduler = PolitenessScheduler(
+            initial_rate=config.POLITENESS_INITIAL_RATE / share,
+            max_rate=config.POLITENESS_MAX_RATE / share,
+            min_rate=config.POLITENESS_MIN_RATE / share,
+            burst=max(1, config.POLITENESS_BURST // share)
+        )
+        _scheduler_loop = loop
+    return _scheduler
@@ -0,0 +1,97 @@
+import gzip
+import json
+import typing
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder produces the same JSON
+    orjson = None
+
+
+def _field_tree(model: typing.Type[BaseModel]) -> Dict[str, Optional[dict]]:
+    """Map each field of a model to the fields of its nested model, or None for plain values."""
+    tree = {}
+    for name, field in model.model_fields.items():
+        nested = None
+        for candidate in (field.annotation, *typing.get_args(field.annotation)):
+            if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+                nested = _field_tree(candidate)
+        tree[name] = nested
+    return tree
+
+
+def parse_fields(spec: Optional[str], model: typing.Type[BaseModel]) -> Optional[Dict[str, Optional[dict]]]:
+    """Parse a selection such as 'markdown,related_pages.url' against a response model.
+
+    Returns None when every field is wanted. Raises ValueError for fields the
+    model does not have.
+    """
+    if not spec or not spec.strip():
+        return None
+
+    available = _field_tree(model)
+    selected: Dict[str, Optional[dict]] = {}
+    for path in spec.split(','):
+        path = path.strip()
+        if not path:
+            continue
+
+        fields, node = available, selected
+        parts = path.split('.')
+        for depth, part in enumerate(parts):
+            if fields is None or part not in fields:
+                raise ValueError(f"Unknown field: {path}")
+
+            last = depth == len(parts) - 1
+            if last or node.get(part, {}) is None:
+                node[part] = None  # The whole value
+                break
+            node = node.setdefault(part, {})
+            fields = fields[part]
+    return selected or None
+
+
+def select_fields(data: Any, fields: Optional[Dict[str, Optional[dict]]]) -> Any:
+    """Copy only the selected fields of a result dict, applying nested selections to list items."""
+    if fields is None:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, fields) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {name: select_fields(data[name], nested) for name, nested in fields.items() if name in data}
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip, honouring q=0 exclusions."""
+    accepted = {}
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    return accepted.get('gzip', accepted.get('*', 0.0)) > 0
+
+
+def encode_json(data: Any, compress_level: Optional[int] = None, min_compress_bytes: int = 0) -> tuple:
+    """Serialize plain result data to UTF-8 JSON without validating it against a model.
+
+    With a compression level, bodies of at least min_compress_bytes are gzipped.
+    Returns (body, compressed).
+    """
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    if compress_level is None or len(body) < min_compress_bytes:
+        return body, False
+    return gzip.compress(body, compresslevel=compress_level, mtime=0), True
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Serve the API from several worker processes.
+
+Each worker binds its own listening socket with SO_REUSEPORT, so the kernel
+spreads new connections evenly across workers. With one shared socket, a
+burst lands on whichever worker wakes first, and its admission queue refuses
+requests that idle workers could have taken.
+
+SIGINT and SIGTERM drain every worker: new connections are refused and
+requests in flight get SCRAPER_SHUTDOWN_TIMEOUT seconds to finish.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+
+import uvicorn
+
+import config
+
+# Root logging is left to main, which queues records so handlers never block the event loop;
+# with one worker it is imported into this process
+logger = logging.getLogger('serve')
+
+APP = 'main:app'
+
+
+def _bind(host: str, port: int, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+def _run_worker(host: str, port: int) -> None:
+    """Worker process entry point: one uvicorn server on its own socket."""
+    sock = _bind(host, port, reuse_port=True)
+    server = uvicorn.Server(uvicorn.Config(APP, timeout_graceful_shutdown=config.SHUTDOWN_TIMEOUT))
+    server.run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int) -> int:
+    """Run the workers until they exit; returns the exit status."""
+    # Workers read their count from the environment to split per-host rate limits between them
+    os.environ['SCRAPER_WORKERS'] = str(workers)
+
+    if workers == 1 or not hasattr(socket, 'SO_REUSEPORT'):
+        uvicorn.run(APP, host=host, port=port, workers=workers, timeout_graceful_shutdown=config.SHUTDOWN_TIMEOUT)
+        return 0
+
+    # SO_REUSEPORT would let the workers share the port with a server that is still running; fail instead
+    _bind(host, port, reuse_port=False).close()
+
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=_run_worker, args=(host, port), name=f'worker-{n}')
+        for n in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Serving {APP} on {host}:{port} with {workers} workers (parent {os.getpid()})")
+
+    def drain(signum, frame):
+        logger.info(f"Received {signal.Signals(signum).name}; draining workers")
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, drain)
+    signal.signal(signal.SIGTERM, drain)
+
+    status = 0
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            logger.error(f"{process.name} exited with status {process.exitcode}")
+            status = 1
+    return status
+
+
+def _configure_logging() -> None:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the scraping API from several worker processes.')
+    parser.add_argument('--host', default=config.SERVER_HOST, help='Interface to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT, help='Port to listen on (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=config.SERVER_WORKERS, help='Worker processes, each with its own event loop, pools and caches (default: %(default)s)')
+    args = parser.parse_args()
+
+    _configure_logging()
+    sys.exit(serve(args.host, args.port, args.workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+from html_to_markdown_converter import MarkdownCrawler
+
+
+def _crawl_results(crawler, count):
+    for _ in range(count):
+        url, depth = crawler.frontier.pop()
+        crawler._record_result(url, depth, f'# {url}', [f'{url}/{n}' for n in range(3)])
+
+
+def test_processed_count_carries_over_resumed_crawls(tmp_path):
+    state = str(tmp_path / 'state.db')
+    crawler = MarkdownCrawler('https://example.com/', max_links=3, max_depth=3, state_path=state)
+    _crawl_results(crawler, 2)
+    url, depth = crawler.frontier.pop()
+    crawler._record_result(url, depth, None, [])  # Failed pages count too
+    assert crawler.processed == 3
+    crawler.frontier.close()
+
+    resumed = MarkdownCrawler('https://example.com/', max_links=3, max_depth=3, state_path=state)
+    assert resumed.processed == 3
+    _crawl_results(resumed, 1)
+    assert resumed.processed == 4
+
+
+def test_duplicates_do_not_count_as_processed(tmp_path):
+    crawler = MarkdownCrawler('https://example.com/', max_links=3, max_depth=3)
+    url, depth = crawler.frontier.pop()
+    crawler._record_result(url, depth, '# Page', ['https://example.com/copy'], fingerprint=1 << 40)
+    url, depth = crawler.frontier.pop()
+    crawler._record_result(url, depth, '# Page', [], fingerprint=1 << 40)
+    assert crawler.processed == 1
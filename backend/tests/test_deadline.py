@@ -0,0 +1,126 @@
+import asyncio
+import importlib
+
+import pytest
+
+from cache import AsyncTTLCache
+from deadline import Deadline, DeadlineExceeded, LatencyEstimate
+from fetcher import NEW, FetchedPage
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    # main opens app.log in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module('main')
+
+
+class FakeFetcher:
+    """Serves every page after a delay, from the network or as if from the page store."""
+
+    def __init__(self, load_seconds, stored=False):
+        self.load_seconds = load_seconds
+        self.stored = stored
+
+    def page_store(self):
+        return None
+
+    async def fetch_page(self, url):
+        await asyncio.sleep(self.load_seconds)
+        html = f'<html><title>{url}</title><body><p>{url}</p></body></html>'
+        return FetchedPage(html, url, NEW, 'text/html', self.stored)
+
+
+def _converter(main, load_seconds, stored=False, page_cache=None):
+    converter = main.MarkdownConverter(
+        max_related_pages=3, fetcher=FakeFetcher(load_seconds, stored), page_cache=page_cache,
+        near_duplicate_distance=-1
+    )
+    converter.page_seconds = LatencyEstimate()
+    converter.visited_urls = set()
+    return converter
+
+
+async def _collect(converter, links, deadline):
+    return [page async for _, page in converter.iter_related_pages(links, deadline)]
+
+
+LINKS = [f'https://example.com/{n}' for n in range(5)]
+
+
+def test_probe_page_recovers_inflated_estimate(main):
+    converter = _converter(main, 0.01)
+    converter.page_seconds.observe(60.0)
+
+    pages = asyncio.run(_collect(converter, LINKS, Deadline(1000)))
+
+    assert len(pages) == 1
+    assert converter.related_status[1]["status"] == "skipped"
+    assert converter.page_seconds.value < 60.0
+
+
+def test_timed_out_pages_are_not_observed(main):
+    converter = _converter(main, 5.0)
+
+    pages = asyncio.run(_collect(converter, LINKS, Deadline(300)))
+
+    assert pages == []
+    assert converter.related_status[0]["status"] == "timed_out"
+    assert converter.page_seconds.value is None
+
+
+def test_only_network_loads_are_observed(main):
+    cache = AsyncTTLCache()
+    converter = _converter(main, 0.05, page_cache=cache)
+    asyncio.run(_collect(converter, LINKS[:3], None))
+    assert converter.page_seconds.value >= 0.05
+
+    # Cached pages come back at once, and must not pull the estimate down
+    estimate = converter.page_seconds.value
+    asyncio.run(_collect(converter, LINKS[:3], None))
+    assert converter.page_seconds.value == estimate
+
+
+def test_page_store_loads_are_not_observed(main):
+    converter = _converter(main, 0.0, stored=True)
+    pages = asyncio.run(_collect(converter, LINKS, None))
+    assert len(pages) == 3
+    assert converter.page_seconds.value is None
+
+
+@pytest.fixture
+def slow_scrape(main, monkeypatch):
+    calls = []
+
+    async def scrape_uncached(url, deadline=None):
+        calls.append(deadline)
+        await asyncio.sleep(0.2)
+        return {"url": url, "partial": deadline is not None}
+
+    monkeypatch.setattr(main, 'response_cache', main.AsyncTTLCache())
+    monkeypatch.setattr(main, '_scrape_uncached', scrape_uncached)
+    return calls
+
+
+def test_deadline_request_waits_on_inflight_load(main, slow_scrape):
+    async def scrape_both():
+        full = asyncio.ensure_future(main._scrape('https://example.com/'))
+        await asyncio.sleep(0)
+        return await asyncio.gather(full, main._scrape('https://example.com/', deadline_ms=1000))
+
+    full, bounded = asyncio.run(scrape_both())
+
+    assert slow_scrape == [None]
+    assert bounded == full and not bounded["partial"]
+
+
+def test_deadline_request_gives_up_on_slow_inflight_load(main, slow_scrape):
+    async def scrape_both():
+        full = asyncio.ensure_future(main._scrape('https://example.com/'))
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded):
+            await main._scrape('https://example.com/', deadline_ms=50)
+        return await full
+
+    assert not asyncio.run(scrape_both())["partial"]
+    assert slow_scrape == [None]
@@ -0,0 +1,111 @@
+import asyncio
+import importlib
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fetcher import AsyncFetcher, UnsupportedContentType
+from http_client import close_session
+from metrics import PAGES_SKIPPED
+
+PAGES = {
+    '/page': ('text/html; charset=utf-8', b'<html><title>Page</title><body><p>Hello</p></body></html>'),
+    '/untyped': (None, b'<html><body><p>No type</p></body></html>'),
+    '/doc.pdf': ('application/pdf', b'%PDF-1.7' + b'\0' * 1_000_000),
+    '/doc.xhtml': ('application/xhtml+xml', b'<html><title>XHTML</title><body><p>Strict</p></body></html>'),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = Counter()  # Path -> GET requests served
+
+    def do_GET(self):
+        self.requests[self.path] += 1
+        if self.path not in PAGES:
+            self.send_error(404)
+            return
+        content_type, body = PAGES[self.path]
+        self.send_response(200)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped reading
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def site():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def _fetch_text(url):
+    async def fetch():
+        try:
+            return await AsyncFetcher(store=None, max_bytes=0).fetch_text(url)
+        finally:
+            await close_session()
+    return asyncio.run(fetch())
+
+
+def test_fetch_text_accepts_html_and_untyped_pages(site):
+    assert 'Hello' in _fetch_text(f'{site}/page')
+    assert 'No type' in _fetch_text(f'{site}/untyped')
+
+
+def test_fetch_text_rejects_non_html(site):
+    with pytest.raises(UnsupportedContentType, match='application/pdf'):
+        _fetch_text(f'{site}/doc.pdf')
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    # main opens app.log in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module('main')
+
+
+def test_scrape_rejects_non_html_seed_with_415(site, main):
+    with TestClient(main.app) as client:
+        response = client.get('/scrape', params={'url': f'{site}/doc.pdf'})
+        assert response.status_code == 415
+        assert 'application/pdf' in response.json()['detail']
+
+        response = client.post('/scrape', json={'url': f'{site}/doc.pdf'})
+        assert response.status_code == 415
+
+        response = client.get('/scrape/stream', params={'url': f'{site}/doc.pdf'})
+        assert response.status_code == 415
+
+        response = client.post('/scrape/batch', json={'urls': [f'{site}/doc.pdf']})
+        assert 'not an HTML page' in response.json()['results'][0]['error']
+
+
+def _skipped_non_html():
+    return PAGES_SKIPPED._values.get(('non_html',), 0)
+
+
+def test_batch_fetches_each_seed_once(site, main):
+    Handler.requests.clear()
+    skipped = _skipped_non_html()
+    with TestClient(main.app) as client:
+        response = client.post('/scrape/batch', json={'urls': [f'{site}/doc.xhtml', f'{site}/doc.pdf']})
+    xhtml, pdf = response.json()['results']
+
+    assert xhtml['result']['title'] == 'XHTML'
+    assert 'not an HTML page' in pdf['error']
+    assert Handler.requests['/doc.xhtml'] == 1
+    assert Handler.requests['/doc.pdf'] == 1
+    assert _skipped_non_html() == skipped + 1
@@ -0,0 +1,40 @@
+import importlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+PAGE = '<html><head><title>Seed</title></head><body><p>Hello</p></body></html>'
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    # main opens app.log in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    main = importlib.import_module('main')
+
+    async def fetch_seed(url, fetcher=None):
+        return PAGE
+
+    monkeypatch.setattr(main, '_fetch_seed', fetch_seed)
+    return main
+
+
+def test_stream_sends_seed_then_summary(main):
+    with TestClient(main.app) as client:
+        response = client.get('/scrape/stream', params={'url': 'https://example.com/'})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event['type'] for event in events] == ['seed', 'summary']
+    assert events[0]['title'] == 'Seed'
+
+
+def test_stream_reports_seed_analysis_errors_with_a_status(main, monkeypatch):
+    async def analyze_seed(self, html, seed_url):
+        raise RuntimeError('parser crashed')
+
+    monkeypatch.setattr(main.MarkdownConverter, 'analyze_seed', analyze_seed)
+    with TestClient(main.app) as client:
+        response = client.post('/scrape/stream', json={'url': 'https://example.com/'})
+    assert response.status_code == 500
+    assert response.json()['detail'] == 'An unexpected error occurred'
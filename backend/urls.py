@@ -0,0 +1,151 @@
+import posixpath
+import re
+import urllib.parse
+from typing import Iterable, List, NamedTuple, Optional
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only track where a visitor came from; they never change the page
+TRACKING_PARAMS = frozenset({
+    'gclid', 'dclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid', 'twclid', 'ttclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok', 'oly_anon_id', 'oly_enc_id',
+    'vero_id', 'ref_src', 'ref_url', 'jsessionid', 'phpsessid', 'sessionid',
+})
+TRACKING_PREFIXES = ('utm_', 'pk_', 'hsa_')
+
+
+def _is_tracking(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """Return a canonical form of a URL so equivalent spellings share one key.
+
+    The scheme and host are lowercased, default ports, fragments and tracking
+    parameters are dropped, and the remaining query parameters are sorted.
+    Raises ValueError for URLs that cannot be split, such as a port that is
+    not a number or an unclosed IPv6 bracket.
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    port = parts.port
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        # IPv6 literals keep their brackets
+        host = f"[{host}]"
+
+    # Drop the port when it is the scheme's default
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+
+    userinfo, at, _ = parts.netloc.rpartition('@')
+    netloc = f"{userinfo}@{host}" if at else host
+
+    path = parts.path or '/'
+
+    # Parameters keep their original encoding; sorting by name keeps the order of repeated ones
+    params = [
+        param for param in parts.query.split('&')
+        if param and not _is_tracking(urllib.parse.unquote_plus(param.partition('=')[0]))
+    ]
+    query = '&'.join(sorted(params, key=lambda param: param.partition('=')[0]))
+
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ''))
+
+
+class LinkCandidate(NamedTuple):
+    url: str  # Absolute, canonical URL
+    text: str  # Anchor text, whitespace collapsed
+    region: Optional[str]  # Enclosing landmark: 'nav', 'header', 'footer', 'aside', 'main' or None
+
+
+# Regions around the content rather than in it
+BOILERPLATE_REGIONS = frozenset({'nav', 'header', 'footer', 'aside'})
+
+# Anchor texts and path segments of links that are rarely worth a fetch
+_LOW_VALUE_TEXT = re.compile(
+    r'^(log ?in|log ?out|sign ?in|sign ?up|register|my account|account|cart|checkout|subscribe|'
+    r'privacy( policy)?|terms( of (use|service))?|cookies?( policy| settings)?|contact( us)?|'
+    r'skip to (main )?content|share|tweet|print|home|back to top)$',
+    re.IGNORECASE
+)
+_LOW_VALUE_SEGMENTS = frozenset({
+    'login', 'logout', 'signin', 'sign-in', 'signup', 'sign-up', 'register', 'account', 'cart',
+    'checkout', 'privacy', 'terms', 'cookies', 'share', 'subscribe', 'feed', 'rss',
+})
+_NON_HTML_EXTENSIONS = frozenset({
+    '.pdf', '.zip', '.gz', '.tar', '.rar', '.7z', '.exe', '.dmg', '.jpg', '.jpeg', '.png', '.gif',
+    '.svg', '.webp', '.ico', '.mp3', '.mp4', '.avi', '.mov', '.webm', '.css', '.js', '.json', '.xml',
+})
+
+
+def _site(host: str) -> str:
+    """The last two labels of a host name, a cheap stand-in for its registrable domain."""
+    host = host.split(':')[0]
+    return '.'.join(host.split('.')[-2:])
+
+
+def score_link(candidate: LinkCandidate, position: float, base: urllib.parse.SplitResult) -> float:
+    """Score how likely a link is to lead to a page worth converting; higher is better.
+
+    position is where the link appears among the page's links, from 0 (first) to 1 (last).
+    """
+    parts = urllib.parse.urlsplit(candidate.url)
+    score = 0.0
+
+    # Same host, then same site
+    if parts.netloc == base.netloc:
+        score += 3
+    elif _site(parts.netloc) == _site(base.netloc):
+        score += 2
+
+    # In the content rather than the page chrome, and earlier rather than later
+    if candidate.region in BOILERPLATE_REGIONS:
+        score -= 2
+    elif candidate.region == 'main':
+        score += 1
+    score += 1 - position
+
+    # Descriptive anchor text
+    words = len(candidate.text.split())
+    if _LOW_VALUE_TEXT.match(candidate.text):
+        score -= 3
+    elif words >= 2:
+        score += min(words, 8) / 4
+    elif words == 0:
+        score -= 0.5
+
+    # Paths at or just below the current page's depth; not the home page, files or account pages
+    segments = [segment for segment in parts.path.split('/') if segment]
+    base_depth = len([segment for segment in base.path.split('/') if segment])
+    if not segments:
+        score -= 1
+    else:
+        score -= abs(len(segments) - max(base_depth, 1)) * 0.25
+        if any(segment.lower() in _LOW_VALUE_SEGMENTS for segment in segments):
+            score -= 3
+        if posixpath.splitext(segments[-1])[1].lower() in _NON_HTML_EXTENSIONS:
+            score -= 3
+
+    return score
+
+
+def rank_links(candidates: Iterable[LinkCandidate], base_url: str) -> List[str]:
+    """Deduplicate links and order them by score, keeping document order between equal scores.
+
+    A link that appears several times keeps its best score.
+    """
+    candidates = list(candidates)
+    base = urllib.parse.urlsplit(canonicalize_url(base_url))
+    last = max(len(candidates) - 1, 1)
+
+    best = {}
+    for index, candidate in enumerate(candidates):
+        score = score_link(candidate, index / last, base)
+        if candidate.url not in best:
+            best[candidate.url] = [score, index]
+        elif score > best[candidate.url][0]:
+            best[candidate.url][0] = score
+
+    return sorted(best, key=lambda url: (-best[url][0], best[url][1]))
@@ -2,4 +2,4 @@
 
 echo "Starting JanusHack Backend Server..."
 cd backend
-python3 main.py
\ No newline at end of file
+python3 serve.py "$@"